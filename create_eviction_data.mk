@@ -2,6 +2,9 @@
 # creates data used in map data panel, creates ranking data, creates 
 # public data for export.
 
+# bash is needed for pipefail so failed steps do not leave partial files
+SHELL := /bin/bash
+
 # Edit node commands to use additional memory
 mapshaper_cmd = node --max_old_space_size=4096 $$(which mapshaper)
 geojson_label_cmd = node --max_old_space_size=4096 $$(which geojson-polygon-labels)
@@ -17,6 +20,15 @@ ts := $(shell date "+%H%M%S")
 # build ID to use for source data
 BUILD_ID?=2018-12-14
 
+# seed for generated confidence intervals, so rebuilds create the same data
+FAKE_DATA_SEED?=0
+export FAKE_DATA_SEED
+
+# format of intermediate data passed between scripts (csv, arrow, or parquet),
+# data that is deployed or read by other tools is always CSV
+DATA_FORMAT?=csv
+export DATA_FORMAT
+
 output_files = $(foreach g,$(geo_types),data/$(g).csv)
 public_data = data/public/US/all.csv data/public/US/national.csv conf/DATA_DICTIONARY.txt $(foreach g, $(geo_types), grouped_public/$(g).csv data/non-imputed/$(g).csv) 
 tool_data = data/rankings/states-rankings.csv data/rankings/cities-rankings.csv data/search/counties.csv data/search/locations.csv data/avg/us.json data/us/national.csv
@@ -76,7 +88,7 @@ deploy_logs:
 
 ## data/%.csv                       : Join evictions and demographics
 data/%.csv: data/demographics/%.csv data/evictions/%.csv
-	python3 scripts/csvjoin.py GEOID,year $^ > $@
+	DATA_FORMAT=csv python3 scripts/csvjoin.py GEOID,year $^ sorted > $@
 
 ### MAP DATA PANEL DATA
 
@@ -136,13 +148,13 @@ data/public/US/national.csv:
 	mkdir -p $(dir $@)
 	aws s3 cp s3://$(S3_SOURCE_DATA_BUCKET)/$(BUILD_ID)/evictions/us.csv.gz - | \
 	gunzip -c | \
-	python3 scripts/convert_varnames.py | \
+	DATA_FORMAT=csv python3 scripts/convert_varnames.py | \
 	csvcut -c year,renter-occupied-households,$(sub_eviction_cols) > $@
 
 ## data/public/US/%.csv             : For US data, pull demographics and full eviction data
 data/public/US/%.csv: data/demographics/%.csv data/full-evictions/%.csv
 	mkdir -p $(dir $@)
-	python3 scripts/csvjoin.py GEOID,year $^ | \
+	python3 scripts/csvjoin.py GEOID,year $^ sorted | \
 	python3 scripts/convert_col_order.py > $@
 
 ### DATA FETCHED FROM S3 SOURCE
@@ -161,37 +173,40 @@ data/full-evictions/cities.csv:
 	mkdir -p $(dir $@)
 	aws s3 cp s3://$(S3_SOURCE_DATA_BUCKET)/$(BUILD_ID)/evictions/cities-unrounded.csv.gz - | \
 	gunzip -c | \
-	python3 scripts/convert_varnames.py | \
-	python3 scripts/create_fake_data.py > $@
+	python3 scripts/run_stages.py $@ scripts/convert_varnames.py scripts/create_fake_data.py \
+		"scripts/sort_data.py GEOID,year" > $@
 
 ## data/full-evictions/%.csv        : Pull eviction data, including imputed/subbed
 data/full-evictions/%.csv:
 	mkdir -p $(dir $@)
 	aws s3 cp s3://$(S3_SOURCE_DATA_BUCKET)/$(BUILD_ID)/evictions/$(notdir $@).gz - | \
 	gunzip -c | \
-	python3 scripts/convert_varnames.py | \
-	python3 scripts/create_fake_data.py > $@
+	python3 scripts/run_stages.py $@ scripts/convert_varnames.py scripts/create_fake_data.py \
+		"scripts/sort_data.py GEOID,year" > $@
 
 ## data/evictions/%.csv             : Pull eviction data, get only necessary columns
 data/evictions/%.csv:
 	mkdir -p $(dir $@)
 	aws s3 cp s3://$(S3_SOURCE_DATA_BUCKET)/$(BUILD_ID)/evictions/$(notdir $@).gz - | \
 	gunzip -c | \
-	python3 scripts/convert_varnames.py | \
-	python3 scripts/create_fake_data.py | \
-	python3 scripts/convert_crosswalk_geo.py $* | \
-	python3 utils/subset_cols.py GEOID,year,$(eviction_cols) > $@
+	python3 scripts/run_stages.py $@ scripts/convert_varnames.py scripts/create_fake_data.py \
+		"scripts/convert_crosswalk_geo.py $*" "scripts/sort_data.py GEOID,year" \
+		"utils/subset_cols.py GEOID,year,$(eviction_cols)" > $@
 
-## data/demographics/%.csv          : Pull demographic data
+## data/demographics/%.csv          : Pull demographic data, sorted by GEOID to join in blocks
+# Demographics data is always CSV with the quoted GEOID in the first column, so
+# it is sorted on disk instead of in memory.  Rows for a GEOID keep their order.
 data/demographics/%.csv:
 	$(MAKE) -f fetch_s3_source.mk $@
+	set -o pipefail; (head -n 1 $@ && tail -n +2 $@ | LC_ALL=C sort -s -t, -k1,1) > $@.tmp && \
+	mv $@.tmp $@
 
 ## data/non-imputed/%.csv:          : Non-imputed data for downloads
 data/non-imputed/%.csv:
 	mkdir -p $(dir $@)
 	aws s3 cp s3://$(S3_SOURCE_DATA_BUCKET)/$(BUILD_ID)/non-imputed/$(notdir $@).gz - | \
 	gunzip -c | \
-	python3 scripts/convert_varnames.py > $@
+	DATA_FORMAT=csv python3 scripts/convert_varnames.py > $@
 
 ## centers/%.geojson                : GeoJSON centers
 centers/%.geojson: census/%.geojson
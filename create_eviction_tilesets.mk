@@ -67,7 +67,7 @@ centers_data/%.mbtiles: centers_data/%.csv centers/$$(subst -$$(lastword $$(subs
 centers_data/%.csv: grouped_data/%.csv
 	mkdir -p $(dir $@)
 	cat $< | \
-	python3 utils/subset_cols.py $($*_center_cols),$(subst $(space),$(comma),$(filter e%,$(subst $(comma),$(space),$(shell head -n 1 $<)))) | \
+	DATA_FORMAT=csv python3 utils/subset_cols.py $($*_center_cols),$(subst $(space),$(comma),$(filter e%,$(subst $(comma),$(space),$(shell head -n 1 $<)))) | \
 	perl -ne 'if ($$. == 1) { s/"//g; } print;' > $@
 
 ## census_data/%.mbtiles            : Create census shape tiles from joining non-eviction data and geography tiles
@@ -1,5 +1,8 @@
 # Fetches raw data from the Census API
 
+# bash is needed for pipefail so failed fetches do not leave partial files
+SHELL := /bin/bash
+
 years = 00 10
 geo_types = states counties cities tracts
 geo_years = $(foreach y,$(years),$(foreach g,$(geo_types),$g-$y))
@@ -11,16 +14,21 @@ ts := $(shell date "+%H%M%S")
 # use this build ID if one is not set in the environment variables
 BUILD_ID?=2018-11-28
 
+# completed partitions of a fetch are stored here so a failed fetch can resume
+export CENSUS_CHECKPOINT_DIR = census/checkpoints/$(BUILD_ID)
+export CENSUS_GEOGRAPHY_DIR = census/geographies/$(BUILD_ID)
+checkpoint_s3 = s3://$(S3_SOURCE_DATA_BUCKET)/$(BUILD_ID)/fetch-checkpoints
+
 .PRECIOUS: census/00/block-groups/%.csv census/10/block-groups/%.csv data/demographics/raw/%.csv
 .SECONDARY: $(foreach f, $(county_fips), census/%/block-groups/$(f).csv)
-.PHONY: all clean deploy deploy_logs
+.PHONY: all clean deploy deploy_logs refresh_fips save_checkpoints restore_checkpoints
 
 ## all                                         : Create all demographics data
 all: $(raw_files)
 
 ## clean                                       : Remove created demographics files
 clean:
-	rm -rf data/demographics/raw
+	rm -rf data/demographics/raw census/checkpoints census/geographies
 	rm -f log/*.txt
 
 # Based on https://swcarpentry.github.io/make-novice/08-self-doc/
@@ -39,37 +47,68 @@ deploy_logs:
 	aws s3 cp log/fetch_log.txt s3://$(S3_SOURCE_DATA_BUCKET)/$(BUILD_ID)/demographics/raw/fetch_log_$(ts).txt
 	rm -f log/*.txt
 
+## save_checkpoints                            : Save completed tract and block group partitions to S3
+save_checkpoints:
+	-aws s3 sync census $(checkpoint_s3) --quiet --exclude "*" \
+		--include "checkpoints/$(BUILD_ID)/*" --include "geographies/$(BUILD_ID)/*" --include "*/block-groups/*.csv" --exclude "*.tmp"
+
+## restore_checkpoints                         : Restore partitions saved to S3 by a failed fetch
+restore_checkpoints:
+	-aws s3 sync $(checkpoint_s3) census --quiet
+
+## refresh_fips                                : Refresh state and county names snapshot from the Census API
+refresh_fips:
+	python3 scripts/create_fips_snapshot.py > conf/fips_names.json.tmp
+	mv conf/fips_names.json.tmp conf/fips_names.json
+
 ### DEMOGRAPHIC DATA
 
 ## data/demographics/raw/%.csv                 : Create raw demographics data fetched from Census API
 data/demographics/raw/%.csv:
 	mkdir -p $(dir $@)
-	python3 scripts/fetch_raw_census_data.py $* | \
-	python3 scripts/fix_duplicates.py > $@
+	set -o pipefail; python3 scripts/fetch_raw_census_data.py $* | \
+	DATA_FORMAT=csv python3 scripts/fix_duplicates.py > $@.tmp
+	mv $@.tmp $@
 
+# Block groups data is sorted by GEOID, so duplicates are combined one county
+# at a time instead of loading the whole file
 ## data/demographics/raw/block-groups-00.csv   : Create raw census data for block groups year 2000
 data/demographics/raw/block-groups-00.csv: census/00/block-groups.csv
 	mkdir -p $(dir $@)
-	python3 scripts/fetch_raw_census_data.py block-groups-00| \
-	python3 scripts/fix_duplicates.py > $@
+	set -o pipefail; python3 scripts/fetch_raw_census_data.py block-groups-00 | \
+	DATA_FORMAT=csv python3 scripts/fix_duplicates.py 5 > $@.tmp
+	mv $@.tmp $@
 
 ## data/demographics/raw/block-groups-10.csv   : Create raw census data for block groups year 2010
 data/demographics/raw/block-groups-10.csv: census/10/block-groups.csv
 	mkdir -p $(dir $@)
-	python3 scripts/fetch_raw_census_data.py block-groups-10 > $@
+	set -o pipefail; python3 scripts/fetch_raw_census_data.py block-groups-10 > $@.tmp
+	mv $@.tmp $@
 
-## census/%/block-groups.csv                   : Consolidate block groups by county
+# Rows crosswalked from ACS 2009 can be in the file of another county (like
+# Broomfield, CO), so the stacked rows are sorted by GEOID on disk to keep the
+# rows of each county together.  The GEOID is the last column and names have
+# commas, so the GEOID is copied to the front of each row to sort on.
+## census/%/block-groups.csv                   : Consolidate block groups by county, sorted by GEOID
 census/%/block-groups.csv: $(foreach f, $(county_fips), census/%/block-groups/$(f).csv)
-	csvstack $^ > $@
+	csvstack $^ > $@.unsorted
+	set -o pipefail; (head -n 1 $@.unsorted && tail -n +2 $@.unsorted | \
+		awk -F, '{ print $$NF "," $$0 }' | LC_ALL=C sort -s -t, -k1,1 | cut -d, -f2-) > $@.tmp && \
+	mv $@.tmp $@
+	rm $@.unsorted
 
+# County files are written to a temporary file and renamed when complete, so
+# a failed fetch can be restarted and only fetch the missing counties
 ## census/00/block-groups/%.csv                : Create 2000 block groups files
 census/00/block-groups/%.csv:
 	mkdir -p $(dir $@)
-	python3 scripts/fetch_raw_block_groups.py $* 00 | \
-	csvcut -c $(census_cols) > $@ 
+	set -o pipefail; python3 scripts/fetch_raw_block_groups.py $* 00 | \
+	csvcut -c $(census_cols) > $@.tmp
+	mv $@.tmp $@ 
 
 ## census/10/block-groups/%.csv                : Create 2010 block groups files
 census/10/block-groups/%.csv:
 	mkdir -p $(dir $@)
-	python3 scripts/fetch_raw_block_groups.py $* 10 | \
-	csvcut -c $(census_cols) > $@ 
+	set -o pipefail; python3 scripts/fetch_raw_block_groups.py $* 10 | \
+	csvcut -c $(census_cols) > $@.tmp
+	mv $@.tmp $@ 
@@ -7,6 +7,11 @@ output_files = $(foreach f, $(geo_types), data/demographics/$(f).csv)
 BUILD_ID?=2018-11-28
 ts := $(shell date "+%H%M%S")
 
+# format of intermediate data passed between scripts (csv, arrow, or parquet),
+# data that is deployed or read by other tools is always CSV
+DATA_FORMAT?=csv
+export DATA_FORMAT
+
 .PRECIOUS: data/demographics/%.csv
 .PHONY: all clean deploy deploy_logs help
 
@@ -42,8 +47,9 @@ data/demographics/raw/%.csv:
 
 ## data/demographics/%.csv                     : Create crosswalked demographic data for geographies
 data/demographics/%.csv: $(foreach y, $(years), data/demographics/years/%-$(y).csv)
-	csvstack $^ | python3 scripts/convert_crosswalk_geo.py $* | \
-	python3 scripts/remove_bad_values.py conf/bad-values-list.csv > $@
+	python3 scripts/stack_data.py $^ | \
+	DATA_FORMAT=csv python3 scripts/run_stages.py $@ "scripts/convert_crosswalk_geo.py $*" \
+		"scripts/remove_bad_values.py conf/bad-values-list.csv" > $@
 
 ## data/demographics/years/%.csv               : Create demographic data grouped by geography and year
 data/demographics/years/%.csv: data/demographics/raw/%.csv
@@ -54,15 +60,15 @@ data/demographics/years/%.csv: data/demographics/raw/%.csv
 data/demographics/years/tracts-00.csv: data/demographics/raw/tracts-00.csv census/00/tracts-weights.csv
 	mkdir -p $(dir $@)
 	cat data/demographics/raw/tracts-00.csv | \
-	python3 scripts/convert_00_geo.py tracts census/00/tracts-weights.csv | \
-	python3 scripts/convert_census_vars.py > $@
+	python3 scripts/run_stages.py $@ "scripts/convert_00_geo.py tracts census/00/tracts-weights.csv" \
+		scripts/convert_census_vars.py > $@
 
 ## data/demographics/years/block-groups-00.csv : Create block-groups-00 demographics, convert with weights
 data/demographics/years/block-groups-00.csv: data/demographics/raw/block-groups-00.csv census/00/block-groups-weights.csv
 	mkdir -p $(dir $@)
 	cat data/demographics/raw/block-groups-00.csv | \
-	python3 scripts/convert_00_geo.py block-groups census/00/block-groups-weights.csv | \
-	python3 scripts/convert_census_vars.py > $@
+	python3 scripts/run_stages.py $@ "scripts/convert_00_geo.py block-groups census/00/block-groups-weights.csv" \
+		scripts/convert_census_vars.py > $@
 
 ### WEIGHTS
 
@@ -71,8 +77,13 @@ census/00/%-geocorr.csv: census/00/geocorr.csv
 	python3 scripts/recalc_afacts.py $* $^ > census/00/$*-geocorr.csv
 
 ## census/00/%-weights.csv                     : Generate weights for 2000 census geographies
-census/00/%-weights.csv: census/00/%-geocorr.csv census/00/nhgis_blk2000_blk2010_ge.csv
-	python3 scripts/create_00_weights.py $* $^ > $@
+# Tract and block group weights are created together in one pass over the block
+# crosswalk, the pattern (stem is ".") makes make run the recipe once for both
+census/00/tracts-weights%csv census/00/block-groups-weights%csv: census/00/geocorr.csv census/00/nhgis_blk2000_blk2010_ge.csv
+	python3 scripts/create_00_weights.py tracts,block-groups $^ \
+		census/00/tracts-weights.csv.tmp census/00/block-groups-weights.csv.tmp
+	mv census/00/tracts-weights.csv.tmp census/00/tracts-weights.csv
+	mv census/00/block-groups-weights.csv.tmp census/00/block-groups-weights.csv
 
 # Uses estimates of geography breakdown from Missouri Census Data Center http://mcdc2.missouri.edu/websas/geocorr2k.html
 ## census/00/geocorr.csv                       : Download Missouri Census Data Center geography weights
@@ -38,14 +38,20 @@ elif [[ $1 == *census* ]]; then
     make -f fetch_census_geography.mk deploy
 elif [[ $1 == *data/demographics/raw* ]]; then
     # job is to fetch demographics from census api
+    # resume from any partitions saved by a previous attempt of this job,
+    # and save completed partitions if the fetch fails so a retry can resume
+    make -f fetch_raw_census_api.mk restore_checkpoints
     # if building block groups, get the census data first and run 10 jobs at a time
     if [[ $1 == *block-groups-00* ]]; then
-        make -f fetch_raw_census_api.mk -j 10 census/00/block-groups.csv
+        make -f fetch_raw_census_api.mk -j 10 census/00/block-groups.csv || \
+            { make -f fetch_raw_census_api.mk save_checkpoints; exit 1; }
     elif [[ $1 == *block-groups-10* ]]; then
-        make -f fetch_raw_census_api.mk -j 10 census/10/block-groups.csv
+        make -f fetch_raw_census_api.mk -j 10 census/10/block-groups.csv || \
+            { make -f fetch_raw_census_api.mk save_checkpoints; exit 1; }
     fi
     # fetch the requested data then deploy the logs and data to S3
-    make -f fetch_raw_census_api.mk $1
+    make -f fetch_raw_census_api.mk $1 || \
+        { make -f fetch_raw_census_api.mk save_checkpoints; exit 1; }
     make -f fetch_raw_census_api.mk deploy_logs
     make -f fetch_raw_census_api.mk deploy
 elif [[ $1 == *data/demographics* ]]; then
@@ -1,5 +1,7 @@
+import requests
 from census import Census
-from census.core import SF1Client
+from census.core import SF1Client, list_or_str
+from data_constants import CENSUS_API_BASE
 
 
 # FIXME: Remove this once the issue is fixed in the upstream repo
@@ -19,7 +21,70 @@ class SF1ClientPatch(SF1Client):
         return super(SF1ClientPatch, self).get(*args, **kwargs)
 
 
+# Raised when a data request to the Census API returns an error status
+class CensusHTTPError(Exception):
+    def __init__(self, status_code, message):
+        super(CensusHTTPError, self).__init__(
+            'HTTP ' + str(status_code) + ': ' + str(message)[:500])
+        self.status_code = status_code
+
+
+# Session that raises a CensusHTTPError with the status code when a data
+# request fails, so the status can be used to decide whether to retry.
+# Can also send requests meant for the Census API to a different base
+# url, used to point the clients at a local stand-in of the API.
+class CensusSessionPatch(requests.Session):
+    def __init__(self, base_url=None):
+        super(CensusSessionPatch, self).__init__()
+        self.base_url = base_url.rstrip('/') + '/' if base_url else None
+
+    def request(self, method, url, *args, **kwargs):
+        if self.base_url and url.startswith(CENSUS_API_BASE):
+            url = self.base_url + url[len(CENSUS_API_BASE):]
+        resp = super(CensusSessionPatch, self).request(method, url, *args, **kwargs)
+        # variable definition lookups fall back to strings when they fail
+        if resp.status_code >= 400 and '/variables' not in url:
+            raise CensusHTTPError(resp.status_code, resp.text)
+        return resp
+
+
 class CensusPatch(Census):
-    def __init__(self, key, year=None, session=None):
+    def __init__(self, key, year=None, session=None, base_url=None):
+        if session is None:
+            session = CensusSessionPatch(base_url)
         super(CensusPatch, self).__init__(key, year, session)
         self.sf1 = SF1ClientPatch(key, year, session)
+
+
+# Maximum number of variables the Census API accepts in one request,
+# leaving room for the geography columns
+MAX_TABLE_FIELDS = 49
+
+
+# Fetches a query from the Census API and returns the response as a list
+# with the column names followed by the rows, as they are in the JSON
+# response.  Unlike `client.get` values are not cast and rows are not
+# converted to dicts, which is left to `decode_table`.
+def get_table(client, fields, geo, year=None):
+    if year is None:
+        year = client.default_year
+    fields = list(list_or_str(fields))
+    if len(fields) > MAX_TABLE_FIELDS:
+        raise TypeError('get_table only supports up to ' + str(MAX_TABLE_FIELDS) + ' fields')
+    if hasattr(client, '_switch_endpoints'):
+        client._switch_endpoints(year)
+
+    params = {
+        'get': ','.join(fields),
+        'for': geo['for'],
+        'key': client._key,
+    }
+    if 'in' in geo:
+        params['in'] = geo['in']
+
+    resp = client.session.get(client.endpoint_url % (year, client.dataset), params=params)
+    if resp.status_code == 204:
+        return []
+    if resp.status_code != 200:
+        raise CensusHTTPError(resp.status_code, resp.text)
+    return resp.json()
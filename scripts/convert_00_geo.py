@@ -16,18 +16,21 @@ argv[2] : str
 Outputs
 -------
 str
-    a string of CSV data containing all of the 2000 census data
-    crosswalked so it fits in 2010 geography
+    a string of data (CSV, or the format set by `DATA_FORMAT`) containing
+    all of the 2000 census data crosswalked so it fits in 2010 geography
 
 """
 
 import sys
 import csv
+import numpy as np
 import pandas as pd
-from utils_validation import (merge_with_stats, logger)
-from utils_census import (create_tract_name, get_block_group_crosswalk_df,
+from utils_validation import (merge_with_stats, get_left_merge_stats,
+                              log_merge_stats, logger)
+from utils_census import (create_tract_names, get_block_group_crosswalk_df,
                         get_tract_crosswalk_09_10_df)
 from data_constants import (COUNT_COLS, RATE_COLS)
+from utils_io import read_data, write_data, concat_data
 
 def changeACS09toCensus10(df, map_df, fromField, toField):
     # get a map of columns `fromField` : `toField`
@@ -38,31 +41,70 @@ def changeACS09toCensus10(df, map_df, fromField, toField):
         df.loc[(df['GEOID'] == fromBg), 'GEOID'] = toBg
     return df
 
-if __name__ == '__main__':
-    # read output from `fetch_raw_census_data.py` into data frame
-    data_df = pd.read_csv(
-        sys.stdin,
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        })
+# Weights from `create_00_weights.py` compiled into a sparse GEOID00 x GEOID10
+# matrix with a count weight and a rate weight for each entry.  Entries are
+# sorted by GEOID10 so the product with the data for a year can be summed
+# for each GEOID10 with a single `np.add.reduceat` over all columns.
+class SparseWeights:
+    def __init__(self, weight_df):
+        weight_df = weight_df.sort_values('GEOID10', kind='mergesort')
+        self.geoid00 = pd.Index(weight_df['GEOID00'].unique())
+        self.geoid10, cols = np.unique(weight_df['GEOID10'].values, return_inverse=True)
+        # first entry for each GEOID10
+        self.starts = np.flatnonzero(np.r_[True, cols[1:] != cols[:-1]])
+        self.rows = self.geoid00.get_indexer(weight_df['GEOID00'])
+        self.count_weights = weight_df['count_weight'].values[:, np.newaxis]
+        self.rate_weights = weight_df['rate_weight'].values[:, np.newaxis]
+
+    # Sums the values of each data row into its GEOID00 row of the matrix.
+    # Missing values are treated as 0, the same as a groupby sum.
+    def to_rows(self, indexes, values):
+        matrix = np.zeros((len(self.geoid00), values.shape[1]))
+        values = np.nan_to_num(values)
+        if len(np.unique(indexes)) == len(indexes):
+            matrix[indexes] = values
+        else:
+            np.add.at(matrix, indexes, values)
+        return matrix
+
+    # Applies the weights to the data for a single year.  Returns a data
+    # frame with the weighted sums for each GEOID10 that has data for at
+    # least one of its GEOID00s.
+    def apply(self, year, df):
+        indexes = self.geoid00.get_indexer(df['GEOID'])
+        df = df.loc[indexes >= 0]
+        indexes = indexes[indexes >= 0]
+
+        has_data = np.zeros(len(self.geoid00), dtype=int)
+        has_data[indexes] = 1
+        touched = np.add.reduceat(has_data[self.rows], self.starts) > 0
+
+        counts = self.to_rows(indexes, df[COUNT_COLS].values.astype('float64'))
+        rates = self.to_rows(indexes, df[RATE_COLS].values.astype('float64'))
+        counts = np.add.reduceat(counts[self.rows] * self.count_weights, self.starts, axis=0)
+        rates = np.add.reduceat(rates[self.rows] * self.rate_weights, self.starts, axis=0)
+
+        output_df = pd.DataFrame(
+            np.hstack([counts[touched], rates[touched]]), columns=COUNT_COLS + RATE_COLS)
+        output_df.insert(0, 'year', year)
+        output_df.insert(0, 'GEOID10', self.geoid10[touched])
+        return output_df
+
+# Maps the 2000 data in `data_df` for the geography level `geo` to 2010
+# geography with the weights in `weights_file`
+def convert_00_geo(data_df, geo, weights_file):
     # read in weights output from `create_00_weights.py`
-    weight_df = pd.read_csv(
-        sys.argv[2], dtype={
-            'GEOID00': 'object',
-            'GEOID10': 'object'
-        })
+    weight_df = read_data(weights_file)
 
     # add ACS 09 -> 10 rows to weights dataframe with weight of 1
-    if sys.argv[1] == 'block-groups':
+    if geo == 'block-groups':
         acs_09_10_cw_df = get_block_group_crosswalk_df('changes_09acs_to_10cen.csv')
         acs_09_10_cw_df.drop(['county', 'cofips'], axis=1, inplace=True)
         acs_09_10_cw_df.rename(columns={
             'bkg09': 'GEOID09',
             'bkg10': 'GEOID10'
         }, inplace=True)
-    if sys.argv[1] == 'tracts':
+    if geo == 'tracts':
         acs_09_10_cw_df = get_tract_crosswalk_09_10_df()
         acs_09_10_cw_df.rename(columns={
             'trt09': 'GEOID09',
@@ -80,32 +122,30 @@ if __name__ == '__main__':
     del data_df
 
 
-    # merge the census data with the weights for each GEOID
-    log_label = sys.argv[1]+' weights <- data'
-    output_df = merge_with_stats(
-        log_label, weight_df, cw_df, left_on='GEOID00', right_on='GEOID', how='left')
-    del weight_df
+    # log 2000 GEOIDs in the data that do not have weights
+    log_label = geo+' weights <- data'
+    log_merge_stats(log_label, get_left_merge_stats(
+        weight_df, cw_df, left_on='GEOID00', right_on='GEOID'))
 
-    # create data frame with unique GEOID10 and associated name and parent-location
-    context_df = output_df[['GEOID00', 'GEOID10', 'name', 'parent-location']].copy()
+    # create data frame with unique GEOID10 and associated name and parent-location,
+    # taken from the first data row of the first GEOID00 in the same county
+    context_df = weight_df[['GEOID00', 'GEOID10']].join(
+        cw_df.drop_duplicates(subset=['GEOID']).set_index('GEOID')[['name', 'parent-location']],
+        on='GEOID00')
     # drop rows where GEOID00 county != GEOID10 county
     context_df.drop(
         context_df[context_df['GEOID00'].str[:5] != context_df['GEOID10'].str[:5]].index, inplace=True)
     context_df.drop(['GEOID00'], axis=1, inplace=True)
     context_df.drop_duplicates(subset=['GEOID10'], inplace=True)
 
-    # multiply all count columns by the count weight
-    output_df[COUNT_COLS] = output_df[COUNT_COLS].multiply(
-        output_df['count_weight'], axis=0)
-
-    # multiply all rate columns by rate weight
-    output_df[RATE_COLS] = output_df[RATE_COLS].multiply(
-        output_df['rate_weight'], axis=0)
-
-    # sum all values together based on the 2010 geography identifier
-    output_df = pd.DataFrame(
-        output_df.groupby(['GEOID10',
-                           'year'])[COUNT_COLS + RATE_COLS].sum()).reset_index()
+    # multiply the count and rate columns by the weights and sum them for
+    # each 2010 geography, one year at a time
+    weights = SparseWeights(weight_df)
+    del weight_df
+    output_df = pd.concat(
+        [ weights.apply(year, year_df) for year, year_df in cw_df.groupby('year', sort=True) ])
+    del cw_df
+    output_df = output_df.sort_values(['GEOID10', 'year']).reset_index(drop=True)
 
     # overwrite the 2000 GEOID to the 2010 GEOID
     output_df.rename(columns={'GEOID10': 'GEOID'}, inplace=True)
@@ -120,14 +160,29 @@ if __name__ == '__main__':
     output_df['year'] = output_df['year'].astype('int')
 
     # create the name attribute for tracts and block groups
-    if sys.argv[1] == 'tracts':
-        output_df['name'] = output_df['GEOID'].str.slice(5).apply(
-            create_tract_name)
-    elif sys.argv[1] == 'block-groups':
-        output_df['name'] = output_df['GEOID'].str.slice(5, -1).apply(
-            create_tract_name) + '.' + output_df['GEOID'].str.slice(-1)
+    if geo == 'tracts':
+        output_df['name'] = create_tract_names(output_df['GEOID'].str.slice(5))
+    elif geo == 'block-groups':
+        output_df['name'] = create_tract_names(
+            output_df['GEOID'].str.slice(5, -1)) + '.' + output_df['GEOID'].str.slice(-1)
     else:
         raise ValueError('Invalid geography string supplied')
+    return output_df
+
+
+# Output CSV quoting
+QUOTING = csv.QUOTE_NONNUMERIC
+
+
+# Stage for `run_stages.py`, converts all of the data at once with the
+# geography level and weights file in `args`
+def transform(df_iter, args):
+    yield convert_00_geo(concat_data(df_iter), args[0], args[1])
+
+
+if __name__ == '__main__':
+    # read output from `fetch_raw_census_data.py` into data frame
+    output_df = convert_00_geo(read_data(sys.stdin), sys.argv[1], sys.argv[2])
 
     # output to stdout
-    output_df.to_csv(sys.stdout, index=False, quoting=csv.QUOTE_NONNUMERIC)
+    write_data(output_df, sys.stdout, quoting=QUOTING)
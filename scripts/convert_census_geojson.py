@@ -1,29 +1,24 @@
 # Loops through all of the features in the geojson if it is county level
 # or lower and updates the county if it matches any of the counties in
-# COUNTY_CROSSWALK
+# COUNTY_CROSSWALK.  Features are read and written one at a time, so the
+# whole file is never loaded.
 
 import sys
-import json
 from data_constants import COUNTY_CROSSWALK
+from utils_geojson import rewrite_geojson_file
 
 CROSSWALK_GEO = ['counties', 'tracts', 'block-groups']
 
-if __name__ == '__main__':
-    if any([g in sys.argv[1] for g in CROSSWALK_GEO]):
-        with open(sys.argv[1], 'r') as f:
-            geo = json.load(f)
 
-        for feat in geo['features']:
-            if any([
-                    feat['properties']['GEOID'].startswith(g)
-                    for g in COUNTY_CROSSWALK
-            ]):
-                geoid = COUNTY_CROSSWALK.get([
-                    g for g in COUNTY_CROSSWALK
-                    if feat['properties']['GEOID'].startswith(g)
-                ][0])
-                feat['properties'][
-                    'GEOID'] = geoid['GEOID'] + feat['properties']['GEOID'][5:]
+# Updates the county part of the feature GEOID if the county changed
+def crosswalk_feature(feat):
+    geoid = feat['properties']['GEOID']
+    county = COUNTY_CROSSWALK.get(geoid[:5])
+    if county is not None:
+        feat['properties']['GEOID'] = county['GEOID'] + geoid[5:]
+    return feat
+
 
-        with open(sys.argv[1], 'w') as f:
-            json.dump(geo, f)
+if __name__ == '__main__':
+    if any([g in sys.argv[1] for g in CROSSWALK_GEO]):
+        rewrite_geojson_file(sys.argv[1], crosswalk_feature)
@@ -7,6 +7,7 @@ import csv
 import numpy as np
 import pandas as pd
 from data_constants import OUTPUT_COLS
+from utils_io import read_data, write_data, concat_data
 
 
 def generated_cols(df):
@@ -51,13 +52,16 @@ def generated_cols(df):
     return df[OUTPUT_COLS].copy()
 
 
+# Output CSV quoting
+QUOTING = csv.QUOTE_NONNUMERIC
+
+
+# Stage for `run_stages.py`, converts all of the data at once
+def transform(df_iter, args):
+    yield generated_cols(concat_data(df_iter)).round(2)
+
+
 if __name__ == '__main__':
-    df = pd.read_csv(
-        sys.stdin,
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        })
+    df = read_data(sys.stdin)
     df = generated_cols(df).round(2)
-    df.to_csv(sys.stdout, index=False, quoting=csv.QUOTE_NONNUMERIC)
+    write_data(df, sys.stdout, quoting=QUOTING)
@@ -1,16 +1,11 @@
 import sys
-import pandas as pd
 from data_constants import COLUMN_ORDER
+from utils_io import read_data, write_data
 
 if __name__ == '__main__':
-    df = pd.read_csv(
-        sys.stdin,
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        })
+    df = read_data(sys.stdin)
 
     # Ensure all columns are in CSV, output in order
     assert all([c in df.columns.values for c in COLUMN_ORDER])
-    df[COLUMN_ORDER].to_csv(sys.stdout, index=False)
+    # public data is always CSV
+    write_data(df[COLUMN_ORDER], sys.stdout, 'csv')
@@ -1,65 +1,36 @@
 import os
 import csv
 import sys
-import pandas as pd
-from data_constants import COUNTY_CROSSWALK
+from utils_io import read_data, DataWriter
+from utils_crosswalk import (crosswalk_counties, crosswalk_county_children,
+                             crosswalk_places, get_places_crosswalk_df)
 
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+# Number of rows read at a time from stdin
+CHUNK_SIZE = int(os.getenv('CROSSWALK_CHUNK_SIZE', 100000))
+
+# Output CSV quoting
+QUOTING = csv.QUOTE_NONNUMERIC
 
-if __name__ == '__main__':
-    geo = sys.argv[1]
-    df = pd.read_csv(
-        sys.stdin,
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        })
 
+# Stage for `run_stages.py`, crosswalks the GEOIDs of each data frame for the
+# geography level in `args[0]`
+def transform(df_iter, args):
+    geo = args[0]
     if geo == 'counties':
-        for k, v in COUNTY_CROSSWALK.items():
-            if ('name' in df.columns.values
-                    and 'parent-location' in df.columns.values):
-                df.loc[df['GEOID'] == k,
-                       ['GEOID', 'name', 'parent-location']] = [
-                           v['GEOID'], v['name'], v['parent-location']
-                       ]
-            else:
-                df.loc[df['GEOID'] == k, 'GEOID'] = v['GEOID']
+        crosswalk = crosswalk_counties
     elif geo == 'cities':
-        city_df = pd.read_csv(
-            os.path.join(BASE_DIR, 'conf', 'changed_census_places.csv'),
-            dtype={
-                'GEOID00': 'object',
-                'GEOID10': 'object'
-            })
-        city_dicts = city_df.to_dict(orient='records')
-        city_crosswalk = {
-            d['GEOID00']: {
-                'GEOID': d['GEOID10'],
-                'name': d['NAME10']
-            }
-            for d in city_dicts
-        }
-
-        if 'name' in df.columns.values:
-            df.loc[df['GEOID'].isin(city_crosswalk), 'name'] = df.loc[df[
-                'GEOID'].isin(city_crosswalk), 'GEOID'].apply(
-                    lambda x: city_crosswalk[x]['name'])
-        df.loc[df['GEOID'].isin(city_crosswalk), 'GEOID'] = df.loc[df[
-            'GEOID'].isin(city_crosswalk), 'GEOID'].apply(
-                lambda x: city_crosswalk[x]['GEOID'])
+        places_df = get_places_crosswalk_df()
+        crosswalk = lambda df: crosswalk_places(df, places_df)
     elif geo in ['tracts', 'block-groups']:
-        for k, v in COUNTY_CROSSWALK.items():
-            if 'parent-location' in df.columns.values:
-                df.loc[df['GEOID'].str.startswith(k), ['GEOID', 'parent-location']] = [
-                    v['GEOID'] + df.loc[df['GEOID'].str.startswith(k), 'GEOID'].str.slice(5),
-                    v['name'] + ', ' + v['parent-location']
-                ]
-            else:
-                df.loc[
-                    df['GEOID'].str.startswith(k),
-                    'GEOID'] = v['GEOID'] + df.loc[df['GEOID'].str.startswith(
-                        k), 'GEOID'].str.slice(5)
+        crosswalk = crosswalk_county_children
+    else:
+        crosswalk = lambda df: df
+    for df in df_iter:
+        yield crosswalk(df)
 
-    df.to_csv(sys.stdout, index=False, quoting=csv.QUOTE_NONNUMERIC)
+
+if __name__ == '__main__':
+    df_iter = read_data(sys.stdin, chunksize=CHUNK_SIZE)
+    with DataWriter(sys.stdout, quoting=QUOTING) as writer:
+        for df in transform(df_iter, sys.argv[1:]):
+            writer.write(df)
@@ -1,6 +1,6 @@
 import sys
-import pandas as pd
 from data_constants import INT_COLS
+from utils_io import read_data, write_data, concat_data
 
 EVICTION_COLS = [
     'GEOID',
@@ -47,8 +47,12 @@ ID_KEYS = [
     'bkg_fips'
 ]
 
-if __name__ == '__main__':
-    df = pd.read_csv(sys.stdin, dtype={key: 'object' for key in ID_KEYS})
+# Types of the ID columns, read as strings to keep leading zeros
+INPUT_DTYPES = { key: 'object' for key in ID_KEYS }
+
+
+# Renames the columns of eviction data and keeps the eviction columns
+def convert_varnames(df):
     is_national = df.columns.values.tolist() == NATIONAL_COLS
     # Assert at least one of the ID keys is in the input file if not national
     if not is_national:
@@ -67,4 +71,14 @@ if __name__ == '__main__':
     # Fail if GEOID len not one of allowed values, which would prevent join
     if not is_national:
         assert df['GEOID'].str.len().mean() in [2, 5, 7, 11, 12]
-    df[output_cols].to_csv(sys.stdout, index=False)
+    return df[output_cols]
+
+
+# Stage for `run_stages.py`, converts all of the data at once
+def transform(df_iter, args):
+    yield convert_varnames(concat_data(df_iter, INPUT_DTYPES))
+
+
+if __name__ == '__main__':
+    df = read_data(sys.stdin, dtype=INPUT_DTYPES)
+    write_data(convert_varnames(df), sys.stdout)
@@ -1,24 +1,24 @@
 import os
-import boto3
+from functools import partial
+from itertools import repeat
+from multiprocessing import Pool
 import numpy as np
 import pandas as pd
-import geopandas as gpd
 from data_constants import INT_COLS
-from shapely import geometry
-
-upcast_dispatch = {geometry.Point: geometry.MultiPoint, 
-                   geometry.LineString: geometry.MultiLineString, 
-                   geometry.Polygon: geometry.MultiPolygon}
-
-def maybe_cast_to_multigeometry(geom):
-    caster = upcast_dispatch.get(type(geom), lambda x: x[0])
-    return caster([geom])
+from data_schema import DTYPES, get_read_dtypes, expand_dtypes
+from utils_io import read_data
+from utils_s3 import S3Uploader
+from utils_geojson import split_feature_collection
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 PUBLIC_DATA_DIR = os.path.join(BASE_DIR, 'data', 'public')
 BUCKET = os.getenv('S3_DATA_DOWNLOADS_BUCKET')
-s3 = boto3.resource('s3')
-client = boto3.client('s3')
+
+# Number of processes writing state CSV files
+EXPORT_PROCESSES = int(os.getenv('EXPORT_PROCESSES', os.cpu_count() or 1))
+
+# Number of rows of grouped data read at a time for GeoJSON attributes
+ATTRIBUTES_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 10000))
 
 GEO_TYPE_LEN = {
     'states': 2,
@@ -28,82 +28,181 @@ GEO_TYPE_LEN = {
     'block-groups': 12
 }
 
+# Multi-geometry types that single geometries are cast to, to avoid errors
+# https://github.com/geopandas/geopandas/issues/834
+MULTI_GEOMETRY_TYPES = {
+    'Point': 'MultiPoint',
+    'LineString': 'MultiLineString',
+    'Polygon': 'MultiPolygon'
+}
+
+# US data and the rows for each state, set before the state CSV processes
+# are started so they are shared with them
+data_df = None
+data_rows = None
+
 
-def create_state_csvs(df, fips, state):
-    if not os.path.isdir(os.path.join(PUBLIC_DATA_DIR, state)):
-        os.mkdir(os.path.join(PUBLIC_DATA_DIR, state))
+# Creates an index of the row positions for each state (first two
+# characters of the GEOID) and for each state and GEOID length, so each
+# data frame is only scanned once
+def partition_by_state(df):
+    prefixes = df['GEOID'].str[:2].values
+    lengths = df['GEOID'].str.len().values
+    positions = pd.Series(np.arange(len(df)))
+    rows = positions.groupby(prefixes).indices
+    rows.update(positions.groupby([prefixes, lengths]).indices)
+    return rows
+
+
+# Selects the rows for a key of the partition index
+def get_partition(df, rows, key):
+    return df.iloc[rows.get(key, [])]
+
+
+# Writes full CSV data and CSV data for each geography for a state.
+# Returns the geography files and the keys to upload them to.
+def create_state_csvs(fips, state):
+    os.makedirs(os.path.join(PUBLIC_DATA_DIR, state), exist_ok=True)
 
     print('Writing full CSV data for {}'.format(state))
-    df.loc[df['GEOID'].str.startswith(fips)].to_csv(
+    expand_dtypes(get_partition(data_df, data_rows, fips)).to_csv(
         os.path.join(PUBLIC_DATA_DIR, state, 'all.csv'), index=False)
 
+    uploads = []
     for geo, geo_len in GEO_TYPE_LEN.items():
         print('Writing CSV data for {} {}'.format(state, geo))
         filename = os.path.join(PUBLIC_DATA_DIR, state, '{}.csv'.format(geo))
-        df.loc[(df['GEOID'].str.len() == geo_len)
-               & (df['GEOID'].str.startswith(fips))].to_csv(
-                   filename, index=False)
-        client.upload_file(filename, BUCKET, '{}/{}.csv'.format(state, geo))
-        os.remove(filename)
-
-
-def create_state_geojson(df, fips, state):
-    for geo, geo_df in geo_df_map.items():
-        print('Writing GeoJSON for {} {}'.format(state, geo))
-        filename = os.path.join(PUBLIC_DATA_DIR, state,
-                                '{}.geojson'.format(geo))
-        geo_df.loc[geo_df['GEOID'].str.startswith(fips)].to_file(
-            filename, driver='GeoJSON')
-        client.upload_file(filename, BUCKET, '{}/{}.geojson'.format(
-            state, geo))
-        os.remove(filename)
+        expand_dtypes(get_partition(data_df, data_rows, (fips, geo_len))).to_csv(
+            filename, index=False)
+        uploads.append((filename, '{}/{}.csv'.format(state, geo)))
+    return uploads
+
+
+def cast_to_multigeometry(geom):
+    multi_type = MULTI_GEOMETRY_TYPES.get(geom['type']) if geom else None
+    if multi_type is None:
+        return geom
+    return {'type': multi_type, 'coordinates': [geom['coordinates']]}
+
+
+# Loads grouped data for a geography and returns a function that looks up
+# the attributes of a GEOID, with missing, infinite, and -1 values as None.
+# Values of each chunk are kept in arrays instead of a data frame, so the
+# data is never copied all at once and each lookup only converts one row.
+def load_feature_attributes(filename):
+    attr_cols = []
+    positions = {}
+    df_iter = read_data(
+        filename,
+        dtype={ 'n': 'object', 'pl': 'object' },
+        chunksize=ATTRIBUTES_CHUNK_SIZE)
+    for attr_df in df_iter:
+        attr_df.replace([np.inf, -np.inf, -1.0], np.nan, inplace=True)
+        attr_cols = [c for c in attr_df.columns.values if c != 'GEOID']
+        # numbers are floats, as they are when merged with missing GEOIDs
+        object_cols = [c for c in attr_cols if attr_df[c].dtype == object]
+        num_cols = [c for c in attr_cols if c not in object_cols]
+        order = [(object_cols + num_cols).index(c) for c in attr_cols]
+        chunk = (attr_df[object_cols].values,
+                 attr_df[num_cols].values.astype(float), order)
+        positions.update(
+            zip(attr_df['GEOID'].values, zip(repeat(chunk), range(len(attr_df)))))
+
+    def get_attributes(geoid):
+        if geoid not in positions:
+            return dict.fromkeys(attr_cols)
+        (object_values, num_values, order), pos = positions[geoid]
+        values = object_values[pos].tolist() + num_values[pos].tolist()
+        return {
+            c: (None if values[i] != values[i] else values[i])
+            for c, i in zip(attr_cols, order)
+        }
+
+    return get_attributes
+
+
+# Writes the US GeoJSON for a geography and the GeoJSON for each state in one
+# pass over the census GeoJSON, with the grouped data for each feature.
+# Returns the state files and the keys to upload them to.
+def create_geojson(geo, state_fips):
+    get_attributes = load_feature_attributes(
+        os.path.join(BASE_DIR, 'grouped_public', '{}.csv'.format(geo)))
+
+    def route(feat):
+        geoid = feat['properties']['GEOID']
+        feat['properties'].update(get_attributes(geoid))
+        feat['geometry'] = cast_to_multigeometry(feat['geometry'])
+        state = state_fips.get(geoid[:2])
+        return feat, ['US'] if state is None else ['US', state]
+
+    filenames = {'US': os.path.join(PUBLIC_DATA_DIR, 'US', '{}.geojson'.format(geo))}
+    for state in state_fips.values():
+        os.makedirs(os.path.join(PUBLIC_DATA_DIR, state), exist_ok=True)
+        filenames[state] = os.path.join(
+            PUBLIC_DATA_DIR, state, '{}.geojson'.format(geo))
+
+    out_files = {}
+    try:
+        for k, filename in filenames.items():
+            out_files[k] = open(filename, 'w')
+        with open(os.path.join(BASE_DIR, 'census', '{}.geojson'.format(geo)), 'r') as in_file:
+            split_feature_collection(in_file, out_files, route)
+    finally:
+        for out_file in out_files.values():
+            out_file.close()
+
+    return [
+        (filenames[state], '{}/{}.geojson'.format(state, geo))
+        for state in state_fips.values()
+    ]
+
+
+# Uploads the files written for a state, removing them once uploaded
+def upload_state_csvs(uploader, uploads):
+    for filename, key in uploads:
+        uploader.upload(filename, key, remove=True)
 
 
 if __name__ == '__main__':
     state_fips_df = pd.read_csv(
         os.path.join(BASE_DIR, 'conf', 'state_fips.csv'),
-        dtype={'fips': 'object'})
+        dtype=get_read_dtypes())
     state_fips = {
         s[0]: s[1].upper()
         for s in zip(state_fips_df.fips, state_fips_df.usps)
     }
 
     print('Reading United States CSV data')
-    data_df = pd.read_csv(
-        os.path.join(PUBLIC_DATA_DIR, 'US', 'all.csv'),
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        })
-    data_df.replace([np.inf, -np.inf, -1.0], np.nan, inplace=True)
+    data_df = read_data(os.path.join(PUBLIC_DATA_DIR, 'US', 'all.csv'))
+    num_cols = data_df.select_dtypes(include=[np.number]).columns
+    data_df[num_cols] = data_df[num_cols].replace([np.inf, -np.inf, -1.0], np.nan)
 
     # Convert int cols to int
-    data_df[INT_COLS] = data_df[INT_COLS].fillna(0).astype(int)
-
-    geo_df_map = {}
-    for k, v in GEO_TYPE_LEN.items():
-        geo_df = gpd.read_file(
-            os.path.join(BASE_DIR, 'census', '{}.geojson'.format(k)),
-            driver='GeoJSON')
-        attr_df = pd.read_csv(
-            os.path.join(BASE_DIR, 'grouped_public', '{}.csv'.format(k)),
-            dtype={
-                'GEOID': 'object',
-                'n': 'object',
-                'pl': 'object'
-            })
-        geo_df = geo_df.merge(attr_df, on='GEOID', how='left')
-        geo_df.replace([np.inf, -np.inf, -1.0], np.nan, inplace=True)
-        print('Writing United States GeoJSON file for {}'.format(k))
-        # Cast to multipolygon to avoid errors
-        # https://github.com/geopandas/geopandas/issues/834
-        geo_df['geometry'] = geo_df['geometry'].apply(maybe_cast_to_multigeometry)
-        geo_df.to_file(
-            os.path.join(PUBLIC_DATA_DIR, 'US', '{}.geojson'.format(k)),
-            driver='GeoJSON')
-        geo_df_map[k] = geo_df
-
-    for fips, state in state_fips.items():
-        create_state_csvs(data_df, fips, state)
-        create_state_geojson(geo_df_map, fips, state)
+    data_df[INT_COLS] = data_df[INT_COLS].fillna(0).astype(
+        { col: DTYPES[col] for col in INT_COLS })
+    data_rows = partition_by_state(data_df)
+
+    with S3Uploader(BUCKET) as uploader, Pool(EXPORT_PROCESSES) as pool:
+        # write state CSVs in other processes while the GeoJSON is created,
+        # uploading each state's files as soon as they are written
+        csv_results = [
+            pool.apply_async(
+                create_state_csvs, (fips, state),
+                callback=partial(upload_state_csvs, uploader))
+            for fips, state in state_fips.items()
+        ]
+        pool.close()
+
+        # the CSV processes have their own copy of the data
+        data_df = data_rows = None
+
+        for geo in GEO_TYPE_LEN:
+            print('Writing United States and state GeoJSON files for {}'.format(geo))
+            for filename, key in create_geojson(geo, state_fips):
+                uploader.upload(filename, key, remove=True)
+
+        # raise any errors from writing state CSVs
+        for result in csv_results:
+            result.get()
+        pool.join()
+        uploader.wait()
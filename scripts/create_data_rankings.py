@@ -1,7 +1,8 @@
 import sys
 import numpy as np
-import pandas as pd
 from data_constants import RANKINGS_MAX_YEAR
+from data_schema import expand_dtypes
+from utils_io import read_data, write_data
 
 DATA_COLS = [
     'GEOID',
@@ -28,22 +29,14 @@ def area_type(pop):
 
 
 if __name__ == '__main__':
-    data_df = pd.read_csv(
-        sys.argv[1],
-        engine='python',
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        })
+    data_df = read_data(sys.argv[1], engine='python')
     # Get only most recent data, necessary columns
     # FIXME: Uncomment when this lines up
     # max_year = city_data_df['year'].max()
     data_df = data_df.loc[data_df['year'] == RANKINGS_MAX_YEAR][
         DATA_COLS].copy()
 
-    center_df = pd.read_csv(
-        sys.argv[2], engine='python', dtype={'properties/GEOID': 'object'})
+    center_df = read_data(sys.argv[2], engine='python')
     center_df.rename(
         columns={
             'properties/GEOID': 'GEOID',
@@ -55,7 +48,7 @@ if __name__ == '__main__':
     geoid_len = 7 if 'cities' in sys.argv[1] else 2
     center_df['GEOID'] = center_df['GEOID'].str.zfill(geoid_len)
 
-    df = data_df.merge(center_df, on=['GEOID'], how='left')
+    df = expand_dtypes(data_df.merge(center_df, on=['GEOID'], how='left'))
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
     df[['lat', 'lon']] = df[['lat', 'lon']].round(4)
     if 'cities' in sys.argv[1]:
@@ -64,4 +57,4 @@ if __name__ == '__main__':
     df.drop('population', axis=1, inplace=True)
 
     # Write CSV file
-    df.to_csv(sys.argv[3], index=False)
+    write_data(df, sys.argv[3], 'csv')
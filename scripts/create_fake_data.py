@@ -1,37 +1,68 @@
+"""
+Adds random high and low values for a confidence interval to the eviction
+filings, eviction filing rate, evictions, and eviction rate columns.  Each
+column gets a base margin of error, and each low and high value is offset
+from the base margin by a random amount in a random direction.
+
+Set `FAKE_DATA_SEED` to an integer to create the same values on every run
+(for the same input).
+
+Outputs
+-------
+str
+    a string of data (CSV, or the format set by `DATA_FORMAT`) with `-low`
+    and `-high` columns added
+
+"""
+
+import os
 import sys
-import pandas as pd
-import random
+import numpy as np
+from utils_io import read_data, DataWriter
 
 MARGIN_MIN = 5
 MARGIN_MAX = 10
 
-# randomly return 1 or -1
-def random_pos_neg ():
-  rand = random.random()
-  if rand > 0.5:
-    return 1
-  return -1
-
-# Offsets a value by a random amount
-def offset_value (value, low=False, base_margin=0):
-  direction = random_pos_neg()
-  offset = (value * base_margin) * (random.randrange(5, 10) / 100) # create slight difference between high and low
-  amount = (value * base_margin) + (direction * offset)
-  if low:
-    return value - amount
-  return value + amount
-
-# Add random high / low values for confidence interval
-def create_high_low (df, col_name):
-  base_margin = random.randrange(MARGIN_MIN, MARGIN_MAX) / 100 # get a base margin of error value
-  df[col_name + '-low'] = df.apply (lambda row: offset_value(row[col_name], True, base_margin), axis=1)
-  df[col_name + '-high'] = df.apply (lambda row: offset_value(row[col_name], False, base_margin), axis=1)
-  return df
+HIGH_LOW_COLS = ['eviction-filings', 'eviction-filing-rate', 'evictions', 'eviction-rate']
+
+# Number of rows read at a time from stdin
+CHUNK_SIZE = int(os.getenv('FAKE_DATA_CHUNK_SIZE', 100000))
+
+SEED = os.getenv('FAKE_DATA_SEED')
+
+
+# Offsets an array of values by their margin, with a random difference in a
+# random direction for each value to create slight differences between high
+# and low values
+def offset_values(rng, values, margins):
+    directions = np.where(rng.random_sample(values.shape) > 0.5, 1, -1)
+    offsets = rng.randint(5, 10, size=values.shape) / 100
+    return (values * margins) * (1 + directions * offsets)
+
+
+# Adds random high / low values for confidence intervals of all columns at
+# once, using the base margin of error of each column
+def create_high_low(df, cols, margins, rng):
+    values = df[cols].values.astype('float64')
+    low = values - offset_values(rng, values, margins)
+    high = values + offset_values(rng, values, margins)
+    for i, col in enumerate(cols):
+        df[col + '-low'] = low[:, i]
+        df[col + '-high'] = high[:, i]
+    return df
+
+
+# Stage for `run_stages.py`, adds high / low values to each data frame
+def transform(df_iter, args):
+    rng = np.random.RandomState(int(SEED) if SEED else None)
+    # get a base margin of error value for each column
+    margins = rng.randint(MARGIN_MIN, MARGIN_MAX, size=len(HIGH_LOW_COLS)) / 100
+    for df in df_iter:
+        yield create_high_low(df, HIGH_LOW_COLS, margins, rng)
+
 
 if __name__ == '__main__':
-  df = pd.read_csv(sys.stdin, dtype={'GEOID': 'object'})
-  df = create_high_low(df, 'eviction-filings')
-  df = create_high_low(df, 'eviction-filing-rate')
-  df = create_high_low(df, 'evictions')
-  df = create_high_low(df, 'eviction-rate')
-  df.to_csv(sys.stdout, index=False)
+    df_iter = read_data(sys.stdin, chunksize=CHUNK_SIZE)
+    with DataWriter(sys.stdout) as writer:
+        for df in transform(df_iter, sys.argv[1:]):
+            writer.write(df)
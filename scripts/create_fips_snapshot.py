@@ -0,0 +1,76 @@
+"""
+Creates the snapshot of state and county names used for parent locations
+(`conf/fips_names.json`).  States are taken from `conf/state_fips.csv` and
+counties from `conf/fips_codes.txt`, with names fetched from the Census API.
+This is the only place the names are fetched from the Census API, run it
+when the names need to be refreshed.
+
+Outputs
+-------
+str
+    a string of JSON containing the snapshot version, the Census API source
+    and year the names were fetched from, and maps of FIPS code to name for
+    states and counties
+
+"""
+
+import os
+import sys
+import json
+import datetime
+import pandas as pd
+from data_schema import get_read_dtypes
+from utils_census import CensusDataStore, BASE_DIR
+from utils_logging import logger
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SOURCE = 'acs5'
+SNAPSHOT_YEAR = 2015
+
+if __name__ == '__main__':
+    state_fips_df = pd.read_csv(
+        os.path.join(BASE_DIR, 'conf', 'state_fips.csv'),
+        dtype=get_read_dtypes())
+    with open(os.path.join(BASE_DIR, 'conf', 'fips_codes.txt'), 'r') as f:
+        county_fips = [l.strip() for l in f if l.strip()]
+
+    c = CensusDataStore()
+    state_results = c.fetchResults(
+        SNAPSHOT_SOURCE, ('NAME'), {'for': 'state:*'}, year=SNAPSHOT_YEAR)
+    county_results = c.fetchResults(
+        SNAPSHOT_SOURCE, ('NAME'), {'for': 'county:*', 'in': 'state:*'}, year=SNAPSHOT_YEAR)
+    if state_results is None or county_results is None:
+        raise Exception('could not fetch state and county names')
+
+    state_names = {
+        str(r['state']).zfill(2): r['NAME'] for r in state_results
+    }
+    county_names = {
+        str(r['state']).zfill(2) + str(r['county']).zfill(3): r['NAME']
+        for r in county_results if r['state'] != '72'
+    }
+
+    states = {}
+    for fips in state_fips_df['fips']:
+        if fips in state_names:
+            states[fips] = state_names[fips]
+        else:
+            logger.warn('no name found for state ' + fips)
+
+    # counties in the API response that are not in `fips_codes.txt` are kept
+    # so all counties have parent locations
+    counties = dict(county_names)
+    for fips in county_fips:
+        if fips not in counties:
+            logger.warn('no name found for county ' + fips)
+
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'source': SNAPSHOT_SOURCE,
+        'year': SNAPSHOT_YEAR,
+        'created': datetime.date.today().isoformat(),
+        'states': states,
+        'counties': counties,
+    }
+    json.dump(snapshot, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
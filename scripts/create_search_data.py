@@ -1,13 +1,13 @@
 import sys
 import numpy as np
-import pandas as pd
+from utils_io import read_data, write_data
 
 if __name__ == '__main__':
-    df = pd.read_csv(
+    # names are read as strings instead of categories to be combined
+    df = read_data(
         sys.argv[1],
         engine='python',
         dtype={
-            'GEOID': 'object',
             'name': 'object',
             'parent-location': 'object'
         })
@@ -25,8 +25,7 @@ if __name__ == '__main__':
             geoid_len = 7
     df = df[['GEOID', 'name', 'layer']].copy()
 
-    center_df = pd.read_csv(
-        sys.argv[2], engine='python', dtype={'properties/GEOID': 'object'})
+    center_df = read_data(sys.argv[2], engine='python')
     center_df.rename(
         columns={
             'properties/GEOID': 'GEOID',
@@ -50,4 +49,4 @@ if __name__ == '__main__':
     ]].round(4)
 
     # Write CSV file
-    output_df.to_csv(sys.argv[3], index=False)
+    write_data(output_df, sys.argv[3], 'csv')
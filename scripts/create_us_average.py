@@ -1,9 +1,9 @@
 import sys
 import json
-import pandas as pd
+from utils_io import read_data
 
 if __name__ == '__main__':
-    df = pd.read_csv(sys.stdin, dtype={'year': 'object'})
+    df = read_data(sys.stdin, dtype={'year': 'object'})
     avg_records = df.to_dict(orient='records')
     us_avg = {}
     for r in avg_records:
@@ -1,19 +1,48 @@
+"""
+Joins demographics data with eviction data, adding the name and parent
+location of each GEOID from the demographics data.  Rows for GEOIDs that
+are not in the demographics data are dropped.
+
+Arguments
+----------
+argv[1] : str
+    The columns to join on, comma separated (e.g. GEOID,year)
+argv[2] : str
+    The file path to the demographics data
+argv[3] : str
+    The file path to the eviction data
+argv[4] : str
+    (optional) `sorted` if both files are sorted by GEOID.  The files are
+    then joined in blocks of GEOIDs as they are read instead of being
+    loaded at once, and numeric columns are always written as floats.
+
+Outputs
+-------
+str
+    a string of data (CSV, or the format set by `DATA_FORMAT`) containing
+    the joined data
+
+"""
+
+import os
 import sys
 import pandas as pd
-from functools import reduce
-from utils_validation import log_dem_eviction_comparison
+from utils_io import read_data, write_data, DataWriter
+from utils_validation import (
+    get_left_merge_stats, add_merge_stats, log_dem_eviction_stats,
+    log_dem_eviction_comparison
+)
 
 INT_COLS = ['imputed', 'subbed', 'low-flag']
 
-if __name__ == '__main__':
-    join_keys = sys.argv[1].split(',')
-    dtypes = {k: 'object' for k in join_keys}
-    dtypes['name'] = 'object'
-    dtypes['parent-location'] = 'object'
+# Number of rows read at a time from each file when joining sorted files
+CHUNK_SIZE = int(os.getenv('CSVJOIN_CHUNK_SIZE', 100000))
+
+LOG_LABEL = 'demographics <- eviction data'
 
-    # demographics dataframe
-    dem_df = pd.read_csv(sys.argv[2], dtype=dtypes)
 
+# Joins demographics and eviction data frames on the join keys
+def join_data(dem_df, ev_df, join_keys):
     # dataframe containing names and parent locations
     names_df = dem_df.drop_duplicates('GEOID', keep='last')[['GEOID', 'name', 'parent-location']]
     names_df.set_index('GEOID', inplace=True)
@@ -21,17 +50,12 @@ if __name__ == '__main__':
     # drop name / parent-location from demographics
     dem_df = dem_df.drop(['name', 'parent-location'], axis=1)
 
-    # eviction dataframe
-    ev_df = pd.read_csv(sys.argv[3], dtype=dtypes)
-
-    log_dem_eviction_comparison('demographics <- eviction data', dem_df, ev_df, on=join_keys)
     # join demographics with evictions
-    ev_df.set_index(join_keys, inplace=True)
-    dem_df.set_index(join_keys, inplace=True)
+    ev_df = ev_df.set_index(join_keys)
+    dem_df = dem_df.set_index(join_keys)
     joined_df = dem_df.join(ev_df, how='outer')
 
     # join names and parent locations
-    joined_df.reset_index(level=['year'])
     output_df = pd.merge(names_df, joined_df, how='outer', left_index=True, right_index=True)
 
     # remove rows with no names
@@ -41,5 +65,88 @@ if __name__ == '__main__':
     for col in INT_COLS:
         if col in output_df.columns:
             output_df[col] = output_df[col].fillna(0).astype(int)
+    return output_df
+
+
+# Reads the next chunk from a reader of data sorted by GEOID, returns None
+# when the reader is exhausted
+def read_sorted_chunk(reader, last_geoid):
+    chunk = next(reader, None)
+    if chunk is None or chunk.empty:
+        return None
+    if (
+        not chunk['GEOID'].is_monotonic_increasing or
+        (last_geoid is not None and chunk['GEOID'].iloc[0] < last_geoid)
+    ):
+        raise ValueError('data must be sorted by GEOID to be joined in blocks')
+    return chunk
+
+
+# Generates blocks of rows from each reader of data sorted by GEOID so that
+# all rows for a GEOID are in the same block.  Rows are held until every
+# reader that is not exhausted has read past their GEOID.
+def iter_geoid_blocks(readers):
+    buffers = []
+    active = []
+    for reader in readers:
+        chunk = read_sorted_chunk(reader, None)
+        buffers.append(chunk)
+        active.append(chunk is not None)
+    # readers exhausted before reading any data have no columns
+    if not all(active):
+        raise ValueError('no data to join')
+
+    while any(active):
+        bound = min(buf['GEOID'].iloc[-1] for buf, a in zip(buffers, active) if a)
+        yield [buf.loc[buf['GEOID'] < bound] for buf in buffers]
+        for i, reader in enumerate(readers):
+            buffers[i] = buffers[i].loc[buffers[i]['GEOID'] >= bound]
+            # read more rows if the buffer only has rows for the bound GEOID
+            if active[i] and buffers[i]['GEOID'].iloc[-1] == bound:
+                chunk = read_sorted_chunk(reader, bound)
+                if chunk is None:
+                    active[i] = False
+                else:
+                    buffers[i] = pd.concat([buffers[i], chunk])
+    yield buffers
+
+
+# Joins demographics and eviction data sorted by GEOID one block of GEOIDs
+# at a time, writing each block to `output`
+def join_sorted_data(dem_file, ev_file, join_keys, dtypes, output):
+    readers = [
+        iter(read_data(f, dtype=dtypes, chunksize=CHUNK_SIZE))
+        for f in [dem_file, ev_file]
+    ]
+    stats = None
+    with DataWriter(output, index=True) as writer:
+        for dem_df, ev_df in iter_geoid_blocks(readers):
+            if not ev_df.empty:
+                stats = add_merge_stats(
+                    stats, get_left_merge_stats(dem_df, ev_df, on=join_keys))
+            output_df = join_data(dem_df, ev_df, join_keys)
+            # numeric columns have missing values in some blocks, so they are
+            # floats in every block to keep the output consistent.  float32
+            # columns stay float32 and are written as they were read.
+            float_cols = [
+                col for col in output_df.columns
+                if col not in INT_COLS and output_df[col].dtype.kind in 'iu'
+            ]
+            output_df[float_cols] = output_df[float_cols].astype('float64')
+            if not output_df.empty:
+                writer.write(output_df)
+    if stats is not None:
+        log_dem_eviction_stats(LOG_LABEL, stats)
+
+
+if __name__ == '__main__':
+    join_keys = sys.argv[1].split(',')
+    dtypes = {k: 'object' for k in join_keys}
 
-    output_df.to_csv(sys.stdout)
\ No newline at end of file
+    if len(sys.argv) > 4 and sys.argv[4] == 'sorted':
+        join_sorted_data(sys.argv[2], sys.argv[3], join_keys, dtypes, sys.stdout)
+    else:
+        dem_df = read_data(sys.argv[2], dtype=dtypes)
+        ev_df = read_data(sys.argv[3], dtype=dtypes)
+        log_dem_eviction_comparison(LOG_LABEL, dem_df, ev_df, on=join_keys)
+        write_data(join_data(dem_df, ev_df, join_keys), sys.stdout, index=True)
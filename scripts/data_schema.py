@@ -0,0 +1,94 @@
+import numpy as np
+from data_constants import OUTPUT_COLS, INT_COLS
+
+# GEOIDs and geography codes, read as strings to keep leading zeros
+ID_COLS = [
+    'GEOID', 'GEOID00', 'GEOID10', 'fips', 'cofips', 'state', 'county',
+    'place', 'tract', 'block group', 'bkg00', 'bkg09', 'bkg10', 'bkg12',
+    'trt00', 'trt09', 'trt10', 'trt12', 'properties/GEOID'
+]
+
+# Names that are repeated on the row for every year of a GEOID, kept once
+# for each value as categories
+CATEGORY_COLS = ['name', 'parent-location']
+
+# Percentages created by `convert_census_vars.py` are rounded to 2 decimals,
+# which float32 keeps for every value they have.  Other numbers, like counts
+# (national totals for the US), dollar amounts, and eviction rates, which
+# are not rounded, need more digits than float32 has and stay float64.
+FLOAT32_COLS = [
+    col for col in OUTPUT_COLS
+    if col.startswith('pct-') or col.endswith('-rate')
+]
+FLOAT32_DECIMALS = 2
+
+# Compact types of the columns of pipeline data
+DTYPES = dict(
+    [(col, 'object') for col in ID_COLS] +
+    [(col, 'category') for col in CATEGORY_COLS] +
+    [(col, 'float32') for col in FLOAT32_COLS] +
+    [(col, 'int8') for col in INT_COLS] +
+    [('year', 'int16')]
+)
+
+
+# Returns the types columns are parsed with, strings for IDs and names, with
+# the types in `dtype` taking precedence.  Numbers are parsed as usual and
+# converted to compact types by `compact_dtypes`.
+def get_read_dtypes(dtype=None):
+    read_dtypes = {
+        col: 'object' for col in ID_COLS + CATEGORY_COLS
+    }
+    read_dtypes.update(dtype or {})
+    return read_dtypes
+
+
+# Returns True if all values of an integer series fit in `dtype`
+def fits_dtype(series, dtype):
+    if series.empty:
+        return True
+    info = np.iinfo(dtype)
+    return series.min() >= info.min and series.max() <= info.max
+
+
+# Converts columns of a data frame to their compact types, except columns
+# in `skip`.  Integer types are only used for columns of integers that fit,
+# so columns with missing values stay floats, and float32 is only used for
+# float columns.
+def compact_dtypes(df, skip=()):
+    for col in df.columns:
+        dtype = DTYPES.get(col)
+        if dtype is None or dtype == 'object' or col in skip:
+            continue
+        kind = df[col].dtype.kind
+        if dtype == 'category':
+            if kind == 'O':
+                df[col] = df[col].astype(dtype)
+        elif np.dtype(dtype).kind == 'f':
+            if kind == 'f':
+                df[col] = df[col].astype(dtype)
+        elif kind in 'iu' and fits_dtype(df[col], dtype):
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+# Returns True if a data frame has columns that `expand_dtypes` converts
+def has_compact_dtypes(df):
+    return any(
+        dtype == np.float32 or dtype.name == 'category'
+        for dtype in df.dtypes)
+
+
+# Converts float32 and category columns back to the types data is written
+# with: float32 values are rounded to FLOAT32_DECIMALS as float64, so they
+# are written as they were read, and categories are strings
+def expand_dtypes(df):
+    cols = {}
+    for col, dtype in df.dtypes.items():
+        if dtype == np.float32:
+            cols[col] = df[col].astype('float64').round(FLOAT32_DECIMALS)
+        elif dtype.name == 'category':
+            cols[col] = df[col].astype(object)
+    if not cols:
+        return df
+    return df.assign(**cols)
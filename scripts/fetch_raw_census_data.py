@@ -18,15 +18,20 @@ Example output ():
 """
 
 import os
+import re
 import sys
 import csv
 import time
 import pandas as pd
 from census_patch import CensusPatch as Census
 from data_constants import NUMERIC_COLS
+from data_schema import get_read_dtypes
 from utils_census import (CensusDataStore, postProcessData2000, 
                             postProcessData2010, STATE_FIPS_MAP,
-                            COUNTY_FIPS_MAP, create_tract_name)
+                            COUNTY_FIPS_MAP, create_tract_names,
+                            SOURCES_2000, SOURCES_2010)
+from utils_checkpoint import PartitionCheckpoint
+from utils_fetch import fetch_concurrently
 
 
 CENSUS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'census')
@@ -39,87 +44,91 @@ REMOVE_CITY_SUFFIXES = [
     ' unified governm',
 ]
 
-# Cleanup functions for each geography level to ensure proper
-# geoid values and parent locations.
-DATA_CLEANUP_FUNCS = {
+# Matches the part of a place name before the first suffix to remove
+CITY_NAME_REGEX = re.compile(
+    '^(.*?)(?:' + '|'.join(re.escape(s) for s in REMOVE_CITY_SUFFIXES) + '|$)',
+    re.DOTALL)
+
+# Cleanup for each geography level to ensure proper geoid values and parent
+# locations.  `geoid` is a list of columns and the number of digits to zero
+# pad them to, `parent-location` is the level of the parent location name.
+DATA_CLEANUP_PARTS = {
     'states': {
-        'geoid': lambda x: str(x['state']).zfill(2),
-        'parent-location': lambda x: 'USA'
+        'geoid': [('state', 2)],
+        'parent-location': None
     },
     'counties': {
-        'geoid': (
-            lambda x: str(x['state']).zfill(2) + str(x['county']).zfill(3)
-        ),
-        'parent-location': lambda x: STATE_FIPS_MAP[x['state']]
+        'geoid': [('state', 2), ('county', 3)],
+        'parent-location': 'states'
     },
     'cities': {
-        'geoid': lambda x: str(x['state']).zfill(2) + str(x['place']).zfill(5),
-        'parent-location': lambda x: STATE_FIPS_MAP[x['state']]
+        'geoid': [('state', 2), ('place', 5)],
+        'parent-location': 'states'
     },
     'tracts': {
-        'geoid': lambda x: (
-            str(x['state']).zfill(2) + str(x['county']).zfill(3) +
-            str(x['tract']).zfill(6)
-        ),
-        'parent-location': lambda x: (
-            COUNTY_FIPS_MAP.get(
-                str(x['state']).zfill(2) + str(x['county']).zfill(3),
-                STATE_FIPS_MAP[str(x['state']).zfill(2)]
-            )
-        )
+        'geoid': [('state', 2), ('county', 3), ('tract', 6)],
+        'parent-location': 'counties'
     },
     'block-groups': {
-        'geoid': lambda x: (
-            str(x['state']).zfill(2) + str(x['county']).zfill(3) +
-            str(x['tract']).zfill(6) + str(x['block group'])
-        ),
-        'parent-location': lambda x: (
-            COUNTY_FIPS_MAP.get(
-                str(x['state']).zfill(2) + str(x['county']).zfill(3),
-                STATE_FIPS_MAP[str(x['state']).zfill(2)]
-            )
-        )
+        'geoid': [('state', 2), ('county', 3), ('tract', 6), ('block group', None)],
+        'parent-location': 'counties'
     }
 }
 
-def remove_suffix(v):
-    for s in REMOVE_CITY_SUFFIXES:
-        try:
-            cdpPos = v.index(s)
-            v = v[0:cdpPos]
-        except ValueError:
-            continue
-    return v
+# Removes the suffixes in REMOVE_CITY_SUFFIXES from a series of place names
+def remove_suffixes(names):
+    return names.str.extract(CITY_NAME_REGEX, expand=False)
+
+# Concatenates zero padded geography code columns into GEOIDs
+def create_geoids(df, parts):
+    geoids = None
+    for col, width in parts:
+        codes = df[col].astype(str)
+        if width:
+            codes = codes.str.zfill(width)
+        geoids = codes if geoids is None else geoids + codes
+    return geoids
+
+# Looks up the parent location name for each row, the county name for
+# tracts and block groups (or the state name if the county is not found)
+# and the state name for counties and cities
+def create_parent_locations(df, parent_level):
+    if parent_level is None:
+        return pd.Series('USA', index=df.index)
+    states = df['state'].astype(str).str.zfill(2)
+    state_names = states.map(STATE_FIPS_MAP.names())
+    if state_names.isnull().any():
+        raise KeyError(
+            'no name found for states: ' + ','.join(sorted(states[state_names.isnull()].unique())))
+    if parent_level == 'states':
+        return state_names
+    counties = states + df['county'].astype(str).str.zfill(3)
+    return counties.map(COUNTY_FIPS_MAP.names()).fillna(state_names)
 
 # Perform some cleaning tasks on the data frame based on geography level
 def clean_data_df(df, geo_str):
     if geo_str == 'cities':
-        df['name'] = df['name'].apply(remove_suffix)
+        df['name'] = remove_suffixes(df['name'])
         df['name'] = df['name'].str.strip()
     elif geo_str == 'tracts':
         # generate proper tract name
-        df['name'] = df['tract'].apply(create_tract_name)
+        df['name'] = create_tract_names(df['tract'])
     elif geo_str == 'block-groups':
         # generate proper block group name
-        df['name'] = df['GEOID'].apply(
-            lambda x: create_tract_name(x[5:11]) + '.' + x[11]
-        )
+        df['name'] = create_tract_names(df['GEOID'].str[5:11]) + '.' + df['GEOID'].str[11]
     else:
         # take the first chunk before a comma, strip any leading zeros for other geography levels
-        df['name'] = df['name'].apply(
-            lambda x: (str(x).split(',')[0]).lstrip('0')
-        )
-    
+        df['name'] = df['name'].astype(str).str.split(',').str[0].str.lstrip('0')
+
     # add GEOID column if it's not already present
     if 'GEOID' not in df.columns.values:
-        df['GEOID'] = df.apply(DATA_CLEANUP_FUNCS[geo_str]['geoid'], axis=1)
+        df['GEOID'] = create_geoids(df, DATA_CLEANUP_PARTS[geo_str]['geoid'])
 
     # add parent-location column if it's not already present
     if 'parent-location' not in df.columns.values:
-        df['parent-location'] = (
-            df.apply(DATA_CLEANUP_FUNCS[geo_str]['parent-location'], axis=1)
-        )
-    
+        df['parent-location'] = create_parent_locations(
+            df, DATA_CLEANUP_PARTS[geo_str]['parent-location'])
+
     # get all numeric columns in the data frame
     df_numeric = [col for col in NUMERIC_COLS if col in df.columns.values]
 
@@ -153,37 +162,47 @@ def get_10_data(c, geo_str):
     else:
         raise ValueError('Invalid geography type for 2010 data fetch.')
 
-def create_parent_name(row):
-    try:
-        return DATA_CLEANUP_FUNCS[geo_str]['parent-location'](row)
-    except KeyError:
-        print(row, file=sys.stderr)
-        raise
-
-
-# Load block groups data and perform cleanup
-def get_block_groups_data(year_str):
-    df_list = []
+# Fetch tract data county by county, storing each county in a checkpoint so
+# the fetch can resume if it fails, then write all counties to `output`
+def write_tracts_data(c, year_str, output):
+    if year_str == '00':
+        sources = SOURCES_2000
+        fetch_county = c.fetchCountyTractData2000
+    else:
+        sources = SOURCES_2010
+        fetch_county = c.fetchCountyTractData2010
+
+    # counties available for each source
+    county_fips = [
+        set(c.fetchCountyFips(source, year)) for source, items, year in sources
+    ]
+    counties = sorted(set().union(*county_fips))
+    checkpoint = PartitionCheckpoint('tracts-' + year_str)
+
+    def fetch_partition(county):
+        if checkpoint.is_complete(county):
+            return
+        df = fetch_county(county, county_fips)
+        if df is not None and not df.empty:
+            df = clean_data_df(df, 'tracts')
+        checkpoint.write(county, df)
+
+    fetch_concurrently(fetch_partition, [ (county,) for county in counties ], c.concurrency)
+    checkpoint.merge(counties, output)
+
+# Load block groups data and perform cleanup, writing each chunk to
+# `output` as it is cleaned
+def write_block_groups_data(year_str, output):
     df_iter = pd.read_csv(
         os.path.join(CENSUS_DIR, year_str, 'block-groups.csv'),
-        dtype={
-            'GEOID': 'object',
-            'state': 'object',
-            'county': 'object',
-            'tract': 'object',
-            'block group': 'object',
-        },
+        dtype=get_read_dtypes(),
         encoding='utf-8',
         iterator=True,
         chunksize=50000
     )
-    for df in df_iter:
-        df['name'] = df['tract'].apply(
-            create_tract_name) + '.' + df['block group']
-        df['parent-location'] = df.apply(create_parent_name, axis=1)
+    for i, df in enumerate(df_iter):
         df = clean_data_df(df, 'block-groups')
-        df_list.append(df)
-    return pd.concat(df_list)
+        df.to_csv(output, index=False, header=(i == 0), quoting=csv.QUOTE_NONNUMERIC)
 
 
 if __name__ == '__main__':
@@ -194,21 +213,19 @@ if __name__ == '__main__':
     # pull year from first argument
     year_str = data_str.split('-')[-1]
 
+    if year_str not in ['00', '10']:
+        raise ValueError('An invalid year suffix was supplied')
+
     c = CensusDataStore()
-    
-    if year_str == '00':
-        if geo_str == 'block-groups':
-            df = get_block_groups_data(year_str)
-        else:
+
+    if geo_str == 'block-groups':
+        write_block_groups_data(year_str, sys.stdout)
+    elif geo_str == 'tracts':
+        write_tracts_data(c, year_str, sys.stdout)
+    else:
+        if year_str == '00':
             df = get_00_data(c, geo_str)
-    elif year_str == '10':
-        if geo_str == 'block-groups':
-            df = get_block_groups_data(year_str)
         else:
             df = get_10_data(c, geo_str)
-    else:
-        raise ValueError('An invalid year suffix was supplied')
-
-    if geo_str != 'block-groups':
         df = clean_data_df(df, geo_str)
-    df.to_csv(sys.stdout, index=False, quoting=csv.QUOTE_NONNUMERIC)
+        df.to_csv(sys.stdout, index=False, quoting=csv.QUOTE_NONNUMERIC)
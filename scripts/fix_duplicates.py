@@ -1,55 +1,101 @@
-# In cases where the geography has changed, like Broomfield, CO 
-# there may be duplicate demographic records for a GEOID and year.
-# This script finds the duplicates, calculates weights, and combines
-# the duplicate entries into a single entry.
+"""
+In cases where the geography has changed, like Broomfield, CO there may be
+duplicate demographic records for a GEOID and year.  This script combines
+the duplicate entries into a single entry: counts are summed, rates are
+weighted by the population of each entry, and other columns (name,
+parent-location, ...) are kept from the first entry.  Combined entries
+replace the first duplicate entry in the output.
+
+Arguments
+----------
+argv[1] : int
+    (optional) number of leading GEOID characters the input is grouped by,
+    e.g. 5 for input where all rows for a county are next to each other.
+    If provided the input is processed in chunks instead of being loaded
+    at once.
+
+Outputs
+-------
+str
+    a string of data (CSV, or the format set by `DATA_FORMAT`) with
+    duplicate entries combined
+
+"""
 
 import os
 import sys
-import csv
 import pandas as pd
-import sys
-from data_constants import (COUNT_COLS,RATE_COLS)
+from data_constants import (COUNT_COLS, RATE_COLS, NUMERIC_COLS)
+from data_schema import expand_dtypes
+from utils_io import read_data, write_data, DataWriter
 
+DUPLICATE_KEYS = ['GEOID', 'year']
 
-if __name__ == '__main__':
-  # read output from `fetch_raw_census_data.py` into data frame
-  data_df = pd.read_csv(
-    sys.stdin,
-    dtype={
-      'GEOID': 'object',
-      'name': 'object',
-      'parent-location': 'object'
+# Number of rows read at a time when the input is grouped by GEOID
+CHUNK_SIZE = int(os.getenv('DUPLICATES_CHUNK_SIZE', 100000))
+
+INPUT_DTYPES = { col: 'float64' for col in NUMERIC_COLS }
+
+
+# Combines rows with the same GEOID and year with a single group by, and
+# returns the data frame with each set of duplicates replaced by one row
+def combine_duplicates(df):
+    dupe_mask = df.duplicated(subset=DUPLICATE_KEYS, keep=False)
+    if not dupe_mask.any():
+        return df
+    # duplicates are combined with names as strings, not categories
+    dupes = expand_dtypes(df.loc[dupe_mask])
+    count_cols = [c for c in COUNT_COLS if c in df.columns.values]
+    rate_cols = [c for c in RATE_COLS if c in df.columns.values]
+
+    # weight each rate by population, rates are divided by the total
+    # population after summing
+    weighted = dupes.assign(**{
+        r: dupes[r] * dupes['population'] for r in rate_cols
     })
+    aggs = { col: 'first' for col in df.columns if col not in DUPLICATE_KEYS }
+    aggs.update({ col: 'sum' for col in count_cols + rate_cols })
+    combined = weighted.groupby(DUPLICATE_KEYS, sort=False).agg(aggs)
+    for r in rate_cols:
+        combined[r] = (combined[r] / combined['population']).fillna(0)
+
+    # groups are in order of their first row, so the combined rows take
+    # the place of the first row of each group
+    combined = combined.reset_index()[df.columns]
+    combined.index = dupes.index[~dupes.duplicated(subset=DUPLICATE_KEYS)]
+    return pd.concat([df.loc[~dupe_mask], combined]).sort_index()
+
 
-  # grab the duplicates
-  dupes = data_df[data_df.duplicated(subset=['GEOID', 'year'], keep=False)]
-
-  # if there are no duplicates, return the existing dataframe
-  if dupes.empty:
-    data_df.to_csv(sys.stdout, index=False)
-    exit()
-
-  # get total populations
-  total_pop_df = pd.DataFrame(
-    dupes.groupby(['GEOID', 'year' ])['population'].sum()).reset_index()
-  total_pop_df.rename(columns={'population': 'total_pop'}, inplace=True)
-
-  # calculate weights with total pop
-  dupes = dupes.merge(total_pop_df, on=['GEOID', 'year'], how='left')
-  dupes['weight'] = dupes['population']/dupes['total_pop']
-  for r in RATE_COLS:
-    dupes[r] = dupes[r]*dupes['weight']
-  dupes.drop(columns=['weight'], inplace=True)
-
-  # Sum up duplicate rows with calculated weights
-  singles_df = pd.DataFrame(
-      dupes.groupby(['GEOID',
-                          'year'])[COUNT_COLS + RATE_COLS].sum()).reset_index()
-
-  # Drop the duplicated rows
-  data_df.drop_duplicates(subset=['GEOID', 'year'], keep=False, inplace=True)
-
-  # Add the merged rows
-  output_df = pd.concat([ data_df, singles_df ])
-  
-  output_df.to_csv(sys.stdout, index=False)
+# Reads input grouped by the first `prefix_len` characters of the GEOID in
+# chunks, holding back the rows of the last group in each chunk until the
+# next chunk is read so duplicates are never split between chunks.  Fails if
+# rows for a group that was already written are read, because duplicates in
+# those rows could not be combined.
+def combine_grouped_duplicates(input_file, output, prefix_len, chunksize=CHUNK_SIZE):
+    remainder = None
+    written_prefixes = set()
+    with DataWriter(output) as writer:
+        for chunk in read_data(input_file, dtype=INPUT_DTYPES, chunksize=chunksize):
+            if remainder is not None:
+                chunk = pd.concat([remainder, chunk])
+            prefixes = chunk['GEOID'].str[:prefix_len]
+            if prefixes.isin(written_prefixes).any():
+                raise ValueError(
+                    'data must be grouped by the first ' + str(prefix_len) +
+                    ' characters of the GEOID to combine duplicates in chunks')
+            last_group = prefixes == prefixes.iloc[-1]
+            remainder = chunk.loc[last_group]
+            if not last_group.all():
+                written_prefixes.update(prefixes.loc[~last_group].unique())
+                writer.write(combine_duplicates(chunk.loc[~last_group]))
+        if remainder is not None:
+            writer.write(combine_duplicates(remainder))
+
+
+if __name__ == '__main__':
+    # read output from `fetch_raw_census_data.py`
+    if len(sys.argv) > 1:
+        combine_grouped_duplicates(sys.stdin, sys.stdout, int(sys.argv[1]))
+    else:
+        data_df = read_data(sys.stdin, dtype=INPUT_DTYPES)
+        write_data(combine_duplicates(data_df), sys.stdout)
@@ -1,15 +1,131 @@
+"""
+Groups data by GEOID, with a column for each data column and year
+({ATTR}-{YEAR}) and the name and parent location from the most recent
+year.  Input must be sorted by GEOID (as written by `csvjoin.py`), it is
+pivoted one block of GEOIDs at a time so only one block is in memory.
+
+Arguments
+----------
+argv[1] : str
+    (optional) two digit year of the decade to include (00 or 10), all
+    years from 2000-2019 are included if not provided
+
+Outputs
+-------
+str
+    a string of CSV data with a row for each GEOID
+
+"""
+
 import os
 import sys
 import csv
 import json
+import pickle
+import tempfile
 import numpy as np
 import pandas as pd
+from data_schema import expand_dtypes
+from utils_io import read_data
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 CONTEXT_COLS = ['GEOID', 'n', 'pl']
 
 YEAR_MAP = {'00': 2000, '10': 2010}
 
+# Number of rows read at a time from the input
+CHUNK_SIZE = int(os.getenv('GROUP_CHUNK_SIZE', 100000))
+
+# Pivots a block of rows to a row for each GEOID with a column for each data
+# column and year.  Context columns are taken from the last year of each
+# GEOID, which is kept in `context-year`.
+def pivot_block(df, data_cols, years):
+    df = df.drop_duplicates(subset=['GEOID', 'year'])
+    last_year = df.groupby('GEOID')['year'].transform('max')
+    context_df = df.loc[df['year'] == last_year, CONTEXT_COLS + ['year']]
+    context_df = context_df.rename(columns={ 'year': 'context-year' }).set_index('GEOID')
+
+    wide_df = df.set_index(['GEOID', 'year'])[data_cols].unstack('year')
+    wide_df = wide_df.reindex(columns=[ (col, year) for year in years for col in data_cols ])
+    wide_df.columns = [
+        '{}-{}'.format(col, str(year)[2:]) for col, year in wide_df.columns.values
+    ]
+    return context_df.join(wide_df)
+
+
+# Reads the input sorted by GEOID in chunks and generates blocks that have
+# all rows for each GEOID in the block
+def iter_geoid_blocks(reader, min_year, max_year):
+    remainder = None
+    for chunk in reader:
+        chunk = chunk.loc[(chunk['year'] >= min_year) & (chunk['year'] <= max_year)]
+        if chunk.empty:
+            continue
+        if remainder is not None:
+            chunk = pd.concat([remainder, chunk])
+        if not chunk['GEOID'].is_monotonic_increasing:
+            raise ValueError('data must be sorted by GEOID to be grouped')
+        last_geoid = chunk['GEOID'] == chunk['GEOID'].iloc[-1]
+        remainder = chunk.loc[last_geoid]
+        if not last_geoid.all():
+            yield chunk.loc[~last_geoid]
+    if remainder is not None:
+        yield remainder
+
+
+# Groups data from `input_file` and writes it to `output`.  Grouped blocks
+# are pickled to a temporary file first, because only GEOIDs with data in
+# the most recent year of all data are kept.
+def group_data(input_file, output, col_map, min_year, max_year):
+    years = list(range(min_year, max_year + 1))
+    reader = read_data(input_file, chunksize=CHUNK_SIZE)
+    data_cols = None
+    years_found = set()
+    float_cols = set()
+
+    with tempfile.TemporaryFile() as tmp_file:
+        for df in iter_geoid_blocks(reader, min_year, max_year):
+            df = df.rename(columns=col_map)
+            if data_cols is None:
+                # Get non-context or year columns
+                data_cols = [
+                    c for c in df.columns.values if c not in CONTEXT_COLS + ['year']
+                ]
+            years_found.update(df['year'].unique())
+            block_df = pivot_block(df, data_cols, years)
+            # columns with missing values in any block are floats for all
+            # blocks, integer columns without missing values stay integers
+            float_cols.update(
+                col for col in block_df.columns
+                if block_df[col].dtype.kind == 'f' or block_df[col].isnull().any())
+            pickle.dump(block_df, tmp_file, pickle.HIGHEST_PROTOCOL)
+        if not years_found:
+            raise ValueError('no data for years ' + str(min_year) + '-' + str(max_year))
+        last_year = max(years_found)
+        output_cols = ['n', 'pl'] + [
+            '{}-{}'.format(col, str(year)[2:])
+            for year in years if year in years_found for col in data_cols
+        ]
+
+        tmp_file.seek(0)
+        header = True
+        while True:
+            try:
+                df = pickle.load(tmp_file)
+            except EOFError:
+                break
+            df = expand_dtypes(df.loc[df['context-year'] == last_year, output_cols])
+            df = df.astype({
+                col: 'float64' for col in output_cols
+                if col in float_cols and df[col].dtype.kind in 'iu'
+            })
+            # Replace leftover inf and nan data with -1 null placeholder
+            df = df.replace([np.inf, -np.inf, np.nan], -1.0)
+            df = df[df['n'] != -1.0]
+            df.to_csv(output, header=header, quoting=csv.QUOTE_NONNUMERIC)
+            header = False
+
+
 if __name__ == '__main__':
     with open(
             os.path.join(os.path.dirname(BASE_DIR), 'conf', 'col_map.json'),
@@ -23,54 +139,4 @@ if __name__ == '__main__':
         min_year = 2000
         max_year = 2019
 
-    input_df_list = []
-
-    input_df_iter = pd.read_csv(
-        sys.stdin,
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        },
-        iterator=True,
-        chunksize=10000)
-    for df in input_df_iter:
-        input_df_list.append(
-            df.loc[(df['year'] >= min_year) & (df['year'] <= max_year)])
-
-    input_df = pd.concat(input_df_list)
-    input_df.rename(columns=col_map, inplace=True)
-
-    # Get non-context or year columns
-    data_cols = [
-        c for c in input_df.columns.values if c not in CONTEXT_COLS + ['year']
-    ]
-
-    # Create context dataframe to join later
-    max_year = input_df['year'].max()
-    context_df = input_df.loc[input_df['year'] == max_year, CONTEXT_COLS]
-    context_df.drop_duplicates(subset=['GEOID'], inplace=True)
-    context_df.set_index('GEOID', inplace=True)
-
-    # Create list of dataframes by year with -YEAR appended to data columns
-    year_df_list = []
-    for year in input_df['year'].unique():
-        year_df = input_df.loc[input_df['year'] == year, ['GEOID'] + data_cols]
-        year_df.drop_duplicates(subset=['GEOID'], inplace=True)
-        year_df.set_index('GEOID', inplace=True)
-        year_str = str(year)[2:]
-        year_df.columns = [
-            '{}-{}'.format(col, year_str) for col in year_df.columns.values
-        ]
-        year_df_list.append(year_df)
-
-    # Join all year dataframes together with context on GEOID index
-    output_df = pd.concat([context_df] + year_df_list, axis=1)
-    output_df.index.name = 'GEOID'
-
-    # Replace leftover inf and nan data with -1 null placeholder
-    output_df.replace([np.inf, -np.inf, np.nan], -1.0, inplace=True)
-
-    output_df = output_df[output_df['n'] != -1.0]
-    output_df[~output_df.index.duplicated()].to_csv(
-        sys.stdout, quoting=csv.QUOTE_NONNUMERIC)
+    group_data(sys.stdin, sys.stdout, col_map, min_year, max_year)
@@ -1,6 +1,7 @@
 """
 Recalculates allocation factors for a given geography level and geographic
-correspondence file.
+correspondence file.  `create_00_weights.py` recalculates allocation factors
+while creating weights, this outputs them for a single level.
 
 Arguments
 ----------
@@ -13,7 +14,8 @@ argv[2] : str
 Outputs
 -------
 str
-    a string of CSV data containing the weights
+    a string of data (CSV, or the format set by `DATA_FORMAT`) containing
+    the weights
 
 Output has header: GEOID00,pop2k,afact
 
@@ -22,40 +24,20 @@ Output has header: GEOID00,pop2k,afact
 
 import sys
 import pandas as pd
+from utils_io import read_data, write_data
+from utils_weights import add_geocorr_geoids, GEOID_SLICES, GEOCORR_DTYPES
 
 if __name__ == '__main__':
     # load provided csv files into dataframes
-    geocorr_df = pd.read_csv(
-        sys.argv[2],
-        dtype={
-            'county': 'object',
-            'tract': 'object',
-            'bg': 'object',
-            'block': 'object',
-            'pop2k': 'float64'
-        })
+    geocorr_df = read_data(sys.argv[2], dtype=GEOCORR_DTYPES)
 
     # combine geography levels in the 2000 geo correspondence file to create
-    # block level GEOIDs for all entries
-    geocorr_df['GEOID00'] = (
-        geocorr_df['county'] + geocorr_df['tract'].str.replace(
-            '.', '') + geocorr_df['block'])
-
-    # Create GEOID for the provided geography level (tracts or block groups)
-    if sys.argv[1] == 'tracts':
-        geocorr_df['GEOID'] = (
-            geocorr_df['county'] + geocorr_df['tract'].str.replace(
-                '.', ''))
-        # Slice the last 4 characters off of block GEOID to get tract GEOID
-        geoid_slice = -4
-    elif sys.argv[1] == 'block-groups':
-        geocorr_df['GEOID'] = (
-            geocorr_df['county'] + geocorr_df['tract'].str.replace(
-                '.', '') + geocorr_df['bg'])
-        # Slice the last 3 characters off of block GEOID to get block group GEOID
-        geoid_slice = -3
-    else:
+    # block level GEOIDs for all entries, and the GEOID for the provided
+    # geography level (tracts or block groups)
+    if sys.argv[1] not in GEOID_SLICES:
         raise ValueError('Invalid geography string supplied')
+    geocorr_df = add_geocorr_geoids(geocorr_df)
+    geocorr_df['GEOID'] = geocorr_df[sys.argv[1]]
 
     # recalculate allocation factors
     pop2k_totals = pd.DataFrame(geocorr_df.groupby('GEOID')['pop2k'].sum()).reset_index()
@@ -66,4 +48,4 @@ if __name__ == '__main__':
 
     output_df = geocorr_df[['GEOID00', 'pop2k', 'afact']].copy()
 
-    output_df.to_csv(sys.stdout, index=False)
+    write_data(output_df, sys.stdout)
@@ -4,35 +4,64 @@
 # - sys.argv[1]: the path to a csv file that has a list of GEOID,year,value
 #     where the "value" column contains the column name to remove data for
 #
+# The list is grouped by column, so each chunk of the data set is checked
+# once for every column that has bad values instead of once per entry.
+#
 # NOTE: As of 12-06-18 there are no entries in `conf/bad-values-list.csv`
 #   so this script isn't doing much.  However, it remains in case there
-#   is a need in the future. 
+#   is a need in the future.
 
 import os
 import csv
 import sys
 import pandas as pd
 import numpy as np
+from utils_io import read_data, DataWriter
+from utils_logging import logger
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
-if __name__ == '__main__':
+# Number of rows read at a time from stdin
+CHUNK_SIZE = int(os.getenv('BAD_VALUES_CHUNK_SIZE', 100000))
+
+
+# Creates an index of the GEOID and year of bad values for each column
+def get_bad_value_keys(bad_values_df):
+    return {
+        col: pd.MultiIndex.from_arrays([col_df['GEOID'], col_df['year']])
+        for col, col_df in bad_values_df.groupby('value')
+    }
+
+
+# Sets the bad values in the data frame to NaN
+def remove_bad_values(df, bad_value_keys):
+    keys = pd.MultiIndex.from_arrays([df['GEOID'], df['year']])
+    for col, col_keys in bad_value_keys.items():
+        df.loc[keys.isin(col_keys), col] = np.nan
+    return df
 
-  df = pd.read_csv(
-    sys.stdin,
-    dtype={
-        'GEOID': 'object',
-        'name': 'object',
-        'parent-location': 'object'
-    })
-  bad_values_df = pd.read_csv(
-      sys.argv[1],
-      dtype={'GEOID': 'object'}
-    )
-
-  for row in bad_values_df.itertuples():
-    df.loc[
-      (df['GEOID'] == getattr(row, "GEOID")) & (df['year'] == getattr(row, "year")), 
-      [getattr(row, "value")]] = [ np.nan ]
-
-  df.to_csv(sys.stdout, index=False, quoting=csv.QUOTE_NONNUMERIC)
+
+# Output CSV quoting
+QUOTING = csv.QUOTE_NONNUMERIC
+
+
+# Stage for `run_stages.py`, removes the bad values listed in the file at
+# `args[0]` from each data frame
+def transform(df_iter, args):
+    bad_values_df = read_data(args[0])
+    bad_value_keys = get_bad_value_keys(bad_values_df)
+    for i, df in enumerate(df_iter):
+        if i == 0:
+            for col in [c for c in bad_value_keys if c not in df.columns.values]:
+                logger.warn('bad values listed for missing column: ' + col)
+                del bad_value_keys[col]
+        if len(bad_value_keys):
+            df = remove_bad_values(df, bad_value_keys)
+        yield df
+
+
+if __name__ == '__main__':
+    df_iter = read_data(sys.stdin, chunksize=CHUNK_SIZE)
+    with DataWriter(sys.stdout, quoting=QUOTING) as writer:
+        for df in transform(df_iter, sys.argv[1:]):
+            writer.write(df)
@@ -0,0 +1,154 @@
+"""
+Runs scripts that are chained with pipes in one process, passing data frames
+from one script to the next instead of writing and parsing the data between
+processes.  Each script is a stage with a `transform(df_iter, args)`
+function that takes an iterator of data frames and the script arguments and
+returns an iterator of data frames.  Stages read their input the same way
+as the script: with `INPUT_DTYPES` for the first stage, and in chunks of
+`CHUNK_SIZE` rows for stages that read in chunks.
+
+The time spent in each stage is logged for the target, and added to the
+CSV file at `STAGE_TIMING_FILE` if it is set.
+
+Input
+------
+Data for the first stage in any format read by `utils_io` as stdin
+
+Arguments
+----------
+argv[1] : str
+    The name of the target being created, for the timing report
+argv[2:] : str
+    The stages to run in order, each a script path with the arguments
+    passed to the script, like "scripts/convert_crosswalk_geo.py tracts"
+
+Outputs
+-------
+str
+    a string of data (CSV, or the format set by `DATA_FORMAT`) created by
+    the last stage
+
+"""
+
+import os
+import csv
+import sys
+import time
+import shlex
+import importlib.util
+from utils_io import read_data, concat_data, DataWriter
+from utils_logging import logger
+
+# CSV file the time of each stage is added to, with a row for each stage
+TIMING_FILE = os.getenv('STAGE_TIMING_FILE')
+TIMING_COLS = ['target', 'stage', 'seconds', 'rows']
+
+
+# Loads the module of a stage script without running it as a script
+def load_stage(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, 'transform'):
+        raise ValueError(path + ' can not be run as a stage')
+    return module
+
+
+# Reads data from stdin the way the first stage reads it as a script
+def read_input(module):
+    chunksize = getattr(module, 'CHUNK_SIZE', None)
+    frames = read_data(
+        sys.stdin, dtype=getattr(module, 'INPUT_DTYPES', None),
+        chunksize=chunksize)
+    if not chunksize:
+        frames = [frames]
+    for df in frames:
+        yield df
+
+
+# Splits data frames into chunks of `chunksize` rows, combining smaller data
+# frames, so stages get the same chunks they read as scripts
+def iter_chunks(frames, chunksize):
+    rest = None
+    for df in frames:
+        if rest is not None:
+            df = concat_data([rest, df])
+        end = len(df) - len(df) % chunksize
+        if end == len(df) == chunksize:
+            rest = None
+            yield df
+            continue
+        for start in range(0, end, chunksize):
+            yield df.iloc[start:start + chunksize].copy()
+        rest = df.iloc[end:].copy() if end < len(df) else None
+    if rest is not None:
+        yield rest
+
+
+# Iterates over the data frames of a stage, adding up the time spent getting
+# each data frame.  The time includes the stages before it, which run when
+# the stage gets its input.
+class StageTimer:
+    def __init__(self, name, frames):
+        self.name = name
+        self.frames = frames
+        self.seconds = 0.0
+        self.rows = 0
+
+    def __iter__(self):
+        frames = iter(self.frames)
+        while True:
+            start = time.perf_counter()
+            df = next(frames, None)
+            self.seconds += time.perf_counter() - start
+            if df is None:
+                return
+            self.rows += len(df)
+            yield df
+
+
+# Logs the time spent in each stage, without the time of the stages before
+# it, and the total time of the target
+def report_timing(target, timers, total):
+    rows = []
+    prev_seconds = 0.0
+    for timer in timers:
+        rows.append([target, timer.name, timer.seconds - prev_seconds, timer.rows])
+        prev_seconds = timer.seconds
+    rows.append([target, 'write', total - prev_seconds, timers[-1].rows])
+    rows.append([target, 'total', total, timers[-1].rows])
+    for row in rows:
+        logger.info('%s: %s took %.2fs (%d rows)' % tuple(row))
+    if TIMING_FILE:
+        is_new = not os.path.exists(TIMING_FILE)
+        with open(TIMING_FILE, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(TIMING_COLS)
+            writer.writerows(
+                [row[:2] + [round(row[2], 3)] + row[3:] for row in rows])
+
+
+if __name__ == '__main__':
+    target = sys.argv[1]
+    stages = [shlex.split(stage) for stage in sys.argv[2:]]
+    if not stages:
+        raise ValueError('no stages to run')
+    modules = [load_stage(stage[0]) for stage in stages]
+
+    start = time.perf_counter()
+    timers = [StageTimer('read', read_input(modules[0]))]
+    for i, (stage, module) in enumerate(zip(stages, modules)):
+        frames = timers[-1]
+        chunksize = getattr(module, 'CHUNK_SIZE', None)
+        if i > 0 and chunksize:
+            frames = iter_chunks(frames, chunksize)
+        name = ' '.join([os.path.basename(stage[0])] + stage[1:])
+        timers.append(StageTimer(name, module.transform(frames, stage[1:])))
+
+    quoting = getattr(modules[-1], 'QUOTING', csv.QUOTE_MINIMAL)
+    with DataWriter(sys.stdout, quoting=quoting) as writer:
+        for df in timers[-1]:
+            writer.write(df)
+    report_timing(target, timers, time.perf_counter() - start)
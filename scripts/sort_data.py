@@ -0,0 +1,35 @@
+"""
+Sorts data by columns, so it can be joined in blocks by `csvjoin.py`.  Rows
+with the same values keep the order they are read in.
+
+Arguments
+----------
+argv[1] : str
+    The columns to sort by, comma separated (e.g. GEOID,year)
+
+Outputs
+-------
+str
+    a string of data (CSV, or the format set by `DATA_FORMAT`) sorted by
+    the columns
+
+"""
+
+import sys
+from utils_io import read_data, write_data, concat_data
+
+
+# Sorts a data frame by `cols` with a stable sort
+def sort_data(df, cols):
+    return df.sort_values(cols, kind='mergesort')
+
+
+# Stage for `run_stages.py`, sorts all of the data at once by the columns
+# in `args[0]`
+def transform(df_iter, args):
+    yield sort_data(concat_data(df_iter), args[0].split(','))
+
+
+if __name__ == '__main__':
+    df = read_data(sys.stdin)
+    write_data(sort_data(df, sys.argv[1].split(',')), sys.stdout)
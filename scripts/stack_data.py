@@ -0,0 +1,36 @@
+"""
+Stacks data files with the same columns, like `csvstack`, reading each file
+in chunks.  Files can be in any format read by `utils_io`.
+
+Arguments
+----------
+argv[1:] : str
+    The file paths of the data to stack
+
+Outputs
+-------
+str
+    a string of data (CSV, or the format set by `DATA_FORMAT`) with the rows
+    of every file
+
+"""
+
+import os
+import csv
+import sys
+from utils_io import read_data, DataWriter
+
+# Number of rows read at a time from each file
+CHUNK_SIZE = int(os.getenv('STACK_CHUNK_SIZE', 100000))
+
+if __name__ == '__main__':
+    columns = None
+    with DataWriter(sys.stdout, quoting=csv.QUOTE_NONNUMERIC) as writer:
+        for filename in sys.argv[1:]:
+            df_iter = read_data(filename, chunksize=CHUNK_SIZE)
+            for df in df_iter:
+                if columns is None:
+                    columns = df.columns.tolist()
+                elif df.columns.tolist() != columns:
+                    raise ValueError(filename + ' has different columns')
+                writer.write(df)
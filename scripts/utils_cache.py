@@ -0,0 +1,131 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from utils_logging import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Directory where Census API responses are stored
+CACHE_DIR = os.getenv(
+    'CENSUS_CACHE_DIR', os.path.join(BASE_DIR, 'census', 'api-cache'))
+
+# on: read and write cached responses
+# off: always fetch from the Census API
+# replay: only read cached responses, fail if a response is not cached
+CACHE_MODE = os.getenv('CENSUS_CACHE_MODE', 'on')
+
+# Maximum size of the cache directory in MB, 0 for no limit
+CACHE_MAX_SIZE = float(os.getenv('CENSUS_CACHE_MAX_SIZE', 4096))
+
+CACHE_MODES = ['on', 'off', 'replay']
+
+
+class CacheMissError(Exception):
+    pass
+
+
+# Content addressed store of Census API responses.  Responses are keyed
+# by a hash of the source, year, requested variables, and geography lookup
+# and stored as gzipped JSON.  When the cache grows past `max_size` MB the
+# least recently used responses are removed.
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, mode=CACHE_MODE, max_size=CACHE_MAX_SIZE):
+        if mode not in CACHE_MODES:
+            raise ValueError('Invalid cache mode: ' + str(mode))
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_bytes = int(max_size * 1024 * 1024)
+        self.size = None
+        self.lock = threading.Lock()
+
+    # Creates the key for a request.  Responses stored in a format other than
+    # the list of dicts returned by the census clients (e.g. 'table' for the
+    # raw array of arrays) are keyed separately.
+    def key(self, source, items, lookup_dict, year=None, fmt='records'):
+        if isinstance(items, str):
+            items = [items]
+        request = [source, year, list(items), lookup_dict]
+        if fmt != 'records':
+            request.append(fmt)
+        return hashlib.sha256(
+            json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json.gz')
+
+    # Returns the cached results for the key, or None if they are not cached.
+    # Raises a CacheMissError in replay mode if the results are not cached.
+    def get(self, key, description=''):
+        if self.mode == 'off':
+            return None
+        filename = self.path(key)
+        try:
+            with gzip.open(filename, 'rt', encoding='utf-8') as f:
+                results = json.load(f)['results']
+            # update access time so eviction removes least recently used first
+            os.utime(filename, None)
+            logger.debug('using cached response for ' + description)
+            return results
+        except (IOError, OSError, ValueError, KeyError):
+            if self.mode == 'replay':
+                raise CacheMissError('no cached response for ' + description)
+            return None
+
+    # Stores the results for the key
+    def set(self, key, results, description=''):
+        if self.mode != 'on':
+            return
+        filename = self.path(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = filename + '.' + str(os.getpid()) + '.' + str(threading.get_ident())
+        with gzip.open(tmp_filename, 'wt', encoding='utf-8') as f:
+            json.dump({'request': description, 'results': results}, f)
+        # rename so other processes never read a partially written response
+        os.replace(tmp_filename, filename)
+        self.add_size(os.path.getsize(filename))
+
+    # Returns a list of (access time, size, filename) for all cached responses
+    def entries(self):
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json.gz'):
+                    continue
+                filename = os.path.join(root, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, filename))
+        return entries
+
+    # Tracks the size of the cache and evicts responses if it is too large
+    def add_size(self, nbytes):
+        if self.max_bytes <= 0:
+            return
+        with self.lock:
+            if self.size is None:
+                self.size = sum(e[1] for e in self.entries())
+            else:
+                self.size += nbytes
+            if self.size > self.max_bytes:
+                self.evict()
+
+    # Removes least recently used responses until the cache is at 90% of
+    # the max size.  The size is recalculated from disk because other
+    # processes may share the cache directory.
+    def evict(self):
+        entries = sorted(self.entries())
+        self.size = sum(e[1] for e in entries)
+        target = self.max_bytes * 0.9
+        for atime, nbytes, filename in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(filename)
+                self.size -= nbytes
+            except OSError:
+                continue
+        logger.debug('evicted cached responses, cache size is now ' + str(self.size) + ' bytes')
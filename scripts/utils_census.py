@@ -1,42 +1,80 @@
 import os
 import sys
 import csv
-import time
+import threading
 import traceback
+import numpy as np
 import pandas as pd
 import sys
 import json
+from collections.abc import Mapping
 from utils_validation import (merge_with_stats)
 from utils_logging import logger
-from census_patch import CensusPatch as Census
-from data_constants import (COUNTY_CROSSWALK,
-                            CENSUS_00_SF1_VARS, CENSUS_00_SF1_VAR_MAP,
+from utils_fetch import (RateLimiter, RetryPolicy, fetch_concurrently,
+                         FETCH_CONCURRENCY, FETCH_RATE_LIMIT)
+from utils_cache import ResponseCache
+from utils_geography import GeographyIndex
+from utils_crosswalk import crosswalk_counties
+from data_schema import get_read_dtypes
+from census_patch import CensusPatch as Census, get_table
+from data_constants import (CENSUS_00_SF1_VARS, CENSUS_00_SF1_VAR_MAP,
                             CENSUS_00_SF3_VARS, CENSUS_00_SF3_VAR_MAP,
                             CENSUS_10_VARS, CENSUS_10_VAR_MAP, ACS_VARS,
-                            ACS_VAR_MAP, ACS_12_VARS, ACS_12_VAR_MAP, END_YEAR)
+                            ACS_VAR_MAP, ACS_12_VARS, ACS_12_VAR_MAP, END_YEAR,
+                            NUMERIC_COLS)
 
-if os.getenv('CENSUS_KEY'):
-    c = Census(os.getenv('CENSUS_KEY'))
-else:
-    raise Exception('Environment variable CENSUS_KEY not specified')
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# all state names (except Puerto Rico)
-STATE_FIPS = [
-    r for r in c.acs5.get(('NAME'), {'for': 'state:*'}) if r['state'] != '72'
-]
-# map from state FIPS code to state name
-STATE_FIPS_MAP = {s['state']: s['NAME'] for s in STATE_FIPS}
+# Snapshot of state and county names created by `create_fips_snapshot.py`
+FIPS_SNAPSHOT_FILE = os.path.join(BASE_DIR, 'conf', 'fips_names.json')
 
-# all county names in the US (except Puerto Rico)
-STATE_COUNTY_FIPS = [
-    r for r in c.acs5.get(('NAME'), {'for': 'county:*', 'in': 'state:*'})
-    if r['state'] != '72'
-]
-# map from county fips code to county name
-COUNTY_FIPS_MAP = {
-    str(r['state']).zfill(2) + str(r['county']).zfill(3): r['NAME']
-    for r in STATE_COUNTY_FIPS
-}
+# Creates a Census API client, requests are sent to the base url in
+# the CENSUS_API_URL environment variable if it is set
+def create_census_client():
+    if not os.getenv('CENSUS_KEY'):
+        raise Exception('Environment variable CENSUS_KEY not specified')
+    return Census(os.getenv('CENSUS_KEY'), base_url=os.getenv('CENSUS_API_URL'))
+
+# on-disk cache of Census API responses shared by all fetches
+RESPONSE_CACHE = ResponseCache()
+
+_fips_snapshot = None
+
+# Loads the state and county names snapshot, only read from disk once
+def load_fips_snapshot():
+    global _fips_snapshot
+    if _fips_snapshot is None:
+        if not os.path.isfile(FIPS_SNAPSHOT_FILE):
+            raise IOError(
+                FIPS_SNAPSHOT_FILE + ' does not exist, create it with ' +
+                '`make -f fetch_raw_census_api.mk refresh_fips`')
+        with open(FIPS_SNAPSHOT_FILE, 'r') as f:
+            _fips_snapshot = json.load(f)
+    return _fips_snapshot
+
+# Map from FIPS code to name that loads the names snapshot the first time
+# it is used, so importing this module does not read or fetch anything
+class FipsNameMap(Mapping):
+    def __init__(self, level):
+        self.level = level
+
+    def names(self):
+        return load_fips_snapshot()[self.level]
+
+    def __getitem__(self, fips):
+        return self.names()[fips]
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __len__(self):
+        return len(self.names())
+
+# map from state FIPS code to state name (except Puerto Rico)
+STATE_FIPS_MAP = FipsNameMap('states')
+
+# map from county fips code to county name (except Puerto Rico)
+COUNTY_FIPS_MAP = FipsNameMap('counties')
 
 # Map of geography level to column names to user for join
 CENSUS_JOIN_KEYS = {
@@ -62,41 +100,89 @@ def split_geoid(geoid):
         parts['block'] = geoid[12:]
     return parts
 
-# Updates the county, tract, and block group in the census dataframe passed.
-# Tracts and block groups are mapped based on columns in the map_df.
+# Census API variables that are decoded as numbers, all other columns (names
+# and geography codes) are kept as strings
+NUMERIC_VARS = set(
+    var for var_map in [CENSUS_00_SF1_VAR_MAP, CENSUS_00_SF3_VAR_MAP,
+                        CENSUS_10_VAR_MAP, ACS_VAR_MAP, ACS_12_VAR_MAP]
+    for var, col in var_map.items() if col in NUMERIC_COLS
+)
+
+# Decodes a Census API response in array of arrays format (column names
+# followed by rows) into a data frame one column at a time, without creating
+# a dict for each row.  Numeric variables are parsed to floats, values that
+# are missing or not numbers become NaN.
+def decode_table(table):
+    if not table or len(table) < 2:
+        return pd.DataFrame()
+    headers = table[0]
+    data = {}
+    for header, values in zip(headers, zip(*table[1:])):
+        if header in NUMERIC_VARS:
+            try:
+                values = np.array(values, dtype='float64')
+            except (TypeError, ValueError):
+                # column has missing values or annotations
+                values = pd.to_numeric(np.array(values, dtype=object), errors='coerce')
+        else:
+            values = np.array(values, dtype=object)
+        data[header] = values
+    return pd.DataFrame(data, columns=headers)
+
+# Number of characters for each part of a GEOID
+GEOID_PART_WIDTHS = [('state', 2), ('county', 3), ('tract', 6), ('block group', 1)]
+
+# Remaps the geography code columns in the census dataframe passed using
+# the GEOID mapping in map_df.  A GEOID key is built for each row from
+# `geo_cols` and the whole mapping is applied in one pass, so the cost does
+# not grow with the number of mappings.  The number of rows changed by each
+# mapping is logged.
 #
 # - df: dataframe containing results from the Census API
 # - map_df: dataframe containing two columns with a mapping of
-#       source block group to target block group
-# - fromField: the column name that contains the source block group ids
-# - toField: the column name that contains the target block group ids 
-def changeBlockGroupsInCensusData(df, map_df, fromField, toField):
-    # get a map of columns `fromField` : `toField`
-    bg_dict = pd.Series(map_df[toField].values, index=map_df[fromField]).to_dict()
-
-    # loop through the map and update the data frame if needed
-    for fromBg, toBg in bg_dict.items():
-        from_parts = split_geoid(fromBg) 
-        to_parts = split_geoid(toBg)
-        # update the data frame where conditions are met
-        df.loc[
-            (df['tract'] == from_parts['tract']) & (df['block group'] == from_parts['bg']) & (df['county'] == from_parts['county']), 
-            ['county', 'tract', 'block group']] = [ to_parts['county'], to_parts['tract'], to_parts['bg'] ]
+#       source GEOID to target GEOID
+# - fromField: the column name that contains the source GEOIDs
+# - toField: the column name that contains the target GEOIDs
+# - geo_cols: the geography code columns that make up the GEOIDs, the
+#       state is only used to match rows and is not updated
+def remapGeoidsInCensusData(df, map_df, fromField, toField, geo_cols):
+    if df.empty or map_df.empty:
+        return df
+    # later entries win when a GEOID is mapped more than once
+    geoid_map = map_df.drop_duplicates(fromField, keep='last').set_index(fromField)[toField]
+
+    key = df[geo_cols[0]].astype(str)
+    for col in geo_cols[1:]:
+        key = key + df[col].astype(str)
+    to_geoids = key.map(geoid_map)
+    mask = to_geoids.notna()
+    if not mask.any():
+        return df
+
+    to_geoids = to_geoids[mask]
+    offset = 0
+    for col, width in GEOID_PART_WIDTHS:
+        if col not in geo_cols:
+            break
+        if col != 'state':
+            df.loc[mask, col] = to_geoids.str[offset:offset + width]
+        offset += width
+
+    for from_geoid, count in key[mask].value_counts().sort_index().items():
+        logger.debug('remapped ' + str(count) + ' rows from ' + from_geoid + ' to ' + geoid_map[from_geoid])
     return df
 
+# Updates the county, tract, and block group in the census dataframe passed.
+# Block groups are mapped based on columns in the map_df.
+def changeBlockGroupsInCensusData(df, map_df, fromField, toField):
+    return remapGeoidsInCensusData(
+        df, map_df, fromField, toField, ['state', 'county', 'tract', 'block group'])
+
 # Updates the county and tract in the census dataframe passed.
-# Tracts and block groups are mapped based on columns in the map_df.
+# Tracts are mapped based on columns in the map_df.
 def changeTractsInCensusData(df, map_df, fromField, toField):
-    bg_dict = pd.Series(map_df[toField].values, index=map_df[fromField]).to_dict()
-    # loop through the map and update the data frame if needed
-    for fromTract, toTract in bg_dict.items():
-        from_parts = split_geoid(fromTract) 
-        to_parts = split_geoid(toTract)
-        # update the data frame where conditions are met
-        df.loc[
-            (df['tract'] == from_parts['tract']) & (df['county'] == from_parts['county']), 
-            ['county', 'tract']] = [ to_parts['county'], to_parts['tract'] ]
-    return df
+    return remapGeoidsInCensusData(
+        df, map_df, fromField, toField, ['state', 'county', 'tract'])
 
 # Grab tracts from the block group 09 -> 00 changes and also add
 # any additional tracts from the tracts file.  Returns a dataframe
@@ -110,7 +196,7 @@ def get_tract_crosswalk_09_00_df():
     conf_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'conf')
     cw_df = pd.read_csv(
         os.path.join(conf_dir, 'changes_09acs_to_00cen_tract.csv'),
-        dtype={'cofips': 'object', 'trt09': 'object', 'trt00': 'object'}
+        dtype=get_read_dtypes()
     )
     return pd.concat([cw_df, block_groups_df])
 
@@ -124,7 +210,7 @@ def get_tract_crosswalk_09_10_df():
     conf_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'conf')
     cw_df = pd.read_csv(
         os.path.join(conf_dir, 'changes_09acs_to_10cen_tract.csv'),
-        dtype={'cofips': 'object', 'trt09': 'object', 'trt10': 'object'}
+        dtype=get_read_dtypes()
     )
     return pd.concat([ cw_df, block_groups_df ])
 
@@ -134,12 +220,7 @@ def get_block_group_crosswalk_df(filename):
     conf_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'conf')
     cw_df = pd.read_csv(
         os.path.join(conf_dir, filename),
-        dtype={
-                'cofips': 'object',
-                'bkg00': 'object',
-                'bkg09': 'object',
-                'bkg10': 'object'
-            }
+        dtype=get_read_dtypes()
     )
     # filter out entries where values should not be copied
     if 'nocompare' in cw_df.columns:
@@ -156,21 +237,13 @@ def create_tract_name(tract):
     else:
         return tract_name[:-2] + '.' + tract_name[-2:]
 
-# Checks the data frame for any GEOIDs in the COUNTY_CROSSWALK data constant
-# If there are matches, update the GEOID, name, parent-location with the
-# mapped values.
-def crosswalk_county(df):
-    for k, v in COUNTY_CROSSWALK.items():
-        if (
-            'name' in df.columns.values and
-            'parent-location' in df.columns.values
-        ):
-            df.loc[df['GEOID'] == k, ['GEOID', 'name', 'parent-location']] = (
-                [v['GEOID'], v['name'], v['parent-location']]
-            )
-        elif 'GEOID' in df.columns.values:
-            df.loc[df['GEOID'] == k, 'GEOID'] = v['GEOID']
-    return df
+# Creates tract names for a series of tract codes, following the same rules
+# as `create_tract_name` without calling it for each row
+def create_tract_names(tracts):
+    tract_names = tracts.astype(str).str.lstrip('0')
+    suffixes = tract_names.str[-2:]
+    prefixes = tract_names.str[:-2]
+    return prefixes.where(suffixes == '00', prefixes + '.' + suffixes)
 
 # translate ACS 2009 -> 2000 block groups if needed
 # NOTE: Some entries are also translate from ACS 2009 -> 2010, this happens when
@@ -195,7 +268,7 @@ def update_acs12_block_groups(df):
     filename = 'changes_12acs_10cen_bkg.csv'
     map_df = pd.read_csv(
         os.path.join(conf_dir, filename),
-        dtype={ 'bkg10': 'object', 'bkg12': 'object' }
+        dtype=get_read_dtypes()
     )
     if not map_df.empty:
         df = changeBlockGroupsInCensusData(df, map_df, 'bkg12', 'bkg10')
@@ -206,20 +279,45 @@ def update_acs12_tracts(df):
     filename = 'changes_12acs_10cen_tract.csv'
     map_df = pd.read_csv(
         os.path.join(conf_dir, filename),
-        dtype={ 'trt10': 'object', 'trt12': 'object' }
+        dtype=get_read_dtypes()
     )
     if not map_df.empty:
         df = changeTractsInCensusData(df, map_df, 'trt12', 'trt10')
     return df
 
-# Add years column to data frame
-def addDataFrameYears(df, start, end):
-    df_list = []
-    for year in range(start, end):
-        df_copy = df.copy()
-        df_copy['year'] = year
-        df_list.append(df_copy)
-    return df_list
+# Expands snapshots of data that each apply to a range of years into one
+# data frame with a row for each year.  `snapshots` is a list of
+# (df, start, end) tuples for the years start to end - 1.  The snapshots are
+# stored once and each column is expanded with a single index, instead of
+# copying the data frame for every year.  Rows are ordered by snapshot, then
+# by year, then by row.
+def expandDataFrameYears(snapshots):
+    frames = []
+    indexes = []
+    years = []
+    offset = 0
+    for df, start, end in snapshots:
+        # snapshots without any columns were not fetched
+        if not len(df.columns.values):
+            continue
+        # placeholder so the year column is in the same position as when
+        # it is added to each data frame before concatenating
+        frames.append(df.assign(year=0))
+        year_range = np.arange(start, end)
+        indexes.append(offset + np.tile(np.arange(len(df)), len(year_range)))
+        years.append(np.repeat(year_range, len(df)))
+        offset += len(df)
+    if not len(frames):
+        return pd.DataFrame(columns=['year'])
+    compact_df = pd.concat(frames)
+    del frames
+
+    index = np.concatenate(indexes)
+    expanded_df = pd.DataFrame({
+        col: compact_df[col].values[index] for col in compact_df.columns if col != 'year'
+    }, index=compact_df.index[index], columns=compact_df.columns)
+    expanded_df['year'] = np.concatenate(years)
+    return expanded_df
 
 # Handles merging and processing data fetched from the census API
 # for the years 2000-2010
@@ -233,15 +331,15 @@ def postProcessData2000(sf1_df, sf3_df, acs_df, geo_str):
 
     # Merge SF1 and SF3 results, then add years 2000-2005
     if len(sf1_df.columns.values) and len(sf3_df.columns.values):
-        sf1_df = crosswalk_county(sf1_df)
-        sf3_df = crosswalk_county(sf3_df)
+        sf1_df = crosswalk_counties(sf1_df)
+        sf3_df = crosswalk_counties(sf3_df)
         # merge sf3 results into sf1 results
         log_label = '2000 ' + geo_str + ' sf1 <- sf3'
         census_df = merge_with_stats(log_label, sf1_df, sf3_df, on=CENSUS_JOIN_KEYS.get(geo_str), how='left')
-        census_df = census_df.loc[census_df['state'] != '72'].copy()
-        census_df_list = addDataFrameYears(census_df, 2000, 2005)
+        census_df = census_df.loc[census_df['state'] != '72']
+        snapshots = [(census_df, 2000, 2005)]
     else:
-        census_df_list = None
+        snapshots = []
 
     # Crosswalk the ACS data, then add years 2005-2010
     if len(acs_df.columns.values):
@@ -250,20 +348,13 @@ def postProcessData2000(sf1_df, sf3_df, acs_df, geo_str):
         elif geo_str == 'tracts':
             acs_df = crosswalk_acs_tracts(acs_df)
         
-        acs_df = crosswalk_county(acs_df)
-        acs_df = acs_df.loc[acs_df['state'] != '72'].copy()
-        acs_df.rename(columns=ACS_VAR_MAP, inplace=True)
-        acs_df_list = addDataFrameYears(acs_df, 2005, 2010)
-    else:
-        acs_df_list = None
+        acs_df = crosswalk_counties(acs_df)
+        acs_df = acs_df.loc[acs_df['state'] != '72'].rename(columns=ACS_VAR_MAP)
+        snapshots.append((acs_df, 2005, 2010))
 
-    # return concated data
-    if census_df_list and acs_df_list:
-        return pd.concat(census_df_list + acs_df_list)
-    elif acs_df_list:
-        return pd.concat(acs_df_list)
-    elif census_df_list:
-        return pd.concat(census_df_list)
+    # return data with a row for each year
+    if len(snapshots):
+        return expandDataFrameYears(snapshots)
 
 # Handles merging and processing data fetched from the census API
 # for the years 2010-current
@@ -286,52 +377,95 @@ def postProcessData2010(sf1_df, acs12_df, acs_df, geo_str):
         sf1_df = merge_with_stats(log_label, sf1_df, acs12_df, on=CENSUS_JOIN_KEYS.get(geo_str), how='left')
 
     if not sf1_df.empty:
-        sf1_df = sf1_df.loc[sf1_df['state'] != '72'].copy()
-        sf1_df['year'] = 2010
+        sf1_df = sf1_df.loc[sf1_df['state'] != '72']
     
     if not acs_df.empty:
-        acs_df = acs_df.loc[acs_df['state'] != '72'].copy()
+        acs_df = acs_df.loc[acs_df['state'] != '72']
+
+    acs_df = acs_df.rename(columns=ACS_VAR_MAP)
+
+    # return data with a row for each year
+    return expandDataFrameYears([(sf1_df, 2010, 2011), (acs_df, 2011, END_YEAR)])
 
-    acs_df.rename(columns=ACS_VAR_MAP, inplace=True)
-    acs_df_list = addDataFrameYears(acs_df, 2011, END_YEAR)
+# Census API sources, variables, and years used for 2000-2009 data
+SOURCES_2000 = [
+    ('sf1', CENSUS_00_SF1_VARS, 2000),
+    ('sf3', CENSUS_00_SF3_VARS, 2000),
+    ('acs5', ACS_VARS, 2009),
+]
 
-    return pd.concat([sf1_df] + acs_df_list)
+# Census API sources, variables, and years used for 2010-current data
+SOURCES_2010 = [
+    ('sf1', CENSUS_10_VARS, 2010),
+    ('acs5', ACS_12_VARS, 2012),
+    ('acs5', ACS_VARS, 2015),
+]
 
 class CensusDataStore:
-    def __init__(self):
+    def __init__(self, concurrency=FETCH_CONCURRENCY, rate_limit=FETCH_RATE_LIMIT,
+                 cache=RESPONSE_CACHE, retry_policy=None):
         self.crosswalks = {
             'acs_09_00': get_block_group_crosswalk_df('changes_09acs_to_00cen.csv')
         }
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.local = threading.local()
+        self.geographies = GeographyIndex(self.fetchResults)
+
+    # Get the Census API client for the current thread.  Each worker thread
+    # gets its own client because the clients switch endpoints per request.
+    def getClient(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = create_census_client()
+        return self.local.client
 
     # Get the crosswalk for a specific county
     def getCountyBlockGroupCrosswalk(self, cw_name, county):
         cw_df = self.crosswalks[cw_name]
         return cw_df.loc[cw_df['cofips'] == county]
 
-    # Fetches results from the provided Census API source
-    def fetchResults(self, source, items, lookup_dict, year=None):
-        for attempt in range(10):
-            try:
-                logger.debug('fetching ' + (str(year) if year else '') + ' ' + source + ' data ' + str(lookup_dict))
-                if year:
-                    return getattr(c, source).get(items, lookup_dict, year=year)
-                else:
-                    return getattr(c, source).get(items, lookup_dict)
-            except:
-                exctype, value = sys.exc_info()[:2]
-                logger.debug('received ' + str(exctype.__name__) + ' fetching ' + str(year) + ' ' + source + ' data ' + str(lookup_dict) + ', will retry shortly')
-                logger.debug(value)
-                time.sleep(180)
+    # Fetches results from the response cache, or from the provided Census
+    # API source if they are not cached.  Results are a list of dicts, or
+    # the raw array of arrays if `fmt` is 'table'.
+    def fetchResults(self, source, items, lookup_dict, year=None, fmt='records'):
+        key = self.cache.key(source, items, lookup_dict, year, fmt=fmt)
+        description = (str(year) if year else '') + ' ' + source + ' data ' + str(lookup_dict)
+        results = self.cache.get(key, description)
+        if results is None:
+            results = self.requestResults(source, items, lookup_dict, year=year, fmt=fmt)
+            # failed requests are not cached so they are retried next build
+            if results is not None:
+                self.cache.set(key, results, description)
+        return results
+
+    # Fetches results from the provided Census API source, retrying with the
+    # retry policy if the request fails
+    def requestResults(self, source, items, lookup_dict, year=None, fmt='records'):
+        def request():
+            self.rate_limiter.acquire()
+            logger.debug('fetching ' + (str(year) if year else '') + ' ' + source + ' data ' + str(lookup_dict))
+            client = getattr(self.getClient(), source)
+            if fmt == 'table':
+                return get_table(client, items, lookup_dict, year=year)
+            elif year:
+                return client.get(items, lookup_dict, year=year)
             else:
-                break
-        else: 
-            # could not retrieve data after 10 attempts (20 min)
-            logger.error("could not retrieve " + str(year) + " " + source + " data for: " + json.dumps(lookup_dict))
+                return client.get(items, lookup_dict)
+
+        context = { 'source': source, 'year': year, 'lookup': lookup_dict }
+        try:
+            return self.retry_policy.call(request, context)
+        except Exception:
+            exctype, value = sys.exc_info()[:2]
+            logger.error("could not retrieve " + str(year) + " " + source + " data for: " + json.dumps(lookup_dict) + ' (' + str(exctype.__name__) + ': ' + str(value) + ')')
             return None
 
     # Returns a dataframe with the results or empty dataframe if error
     def fetchData(self, source, items, lookup_dict, year):
-        results_df = pd.DataFrame(self.fetchResults(source, items, lookup_dict, year=year))
+        results_df = decode_table(
+            self.fetchResults(source, items, lookup_dict, year=year, fmt='table'))
         if results_df.empty:
             logger.info('received empty result for query: ' + str(year) + ' ' + source + ' data ' + str(lookup_dict))
         return results_df
@@ -411,16 +545,41 @@ class CensusDataStore:
         lookup_dict = { 'for': 'tract:*', 'in': parent }
         return self.fetchData(source, items, lookup_dict, year)
 
+    # Fetch the FIPS codes for all counties (except Puerto Rico) available
+    # from the source for the given year
+    def fetchCountyFips(self, source, year):
+        counties = self.geographies.get_children(source, year, {'for': 'county:*', 'in': 'state:*'})
+        return [ r['state'] + r['county'] for r in counties if r['state'] != '72' ]
+
     # Fetch data for all tracts in the US by looping through counties and fetching
     # tracts for each
     def fetchTracts(self, source, items, year):
-        geo_df_list = []
-        fips_list = [ r for r in self.fetchResults(source, ('NAME'),  {'for': 'county:*', 'in': 'state:*'}, year=year) if r['state'] != '72' ]
-        for f in fips_list:
-            county = f['state'] + f['county']
-            geo_df_list.append(self.fetchTractsByCounty(source, items, county, year))
+        geo_df_list = fetch_concurrently(
+            self.fetchTractsByCounty,
+            [ (source, items, county, year) for county in self.fetchCountyFips(source, year) ],
+            self.concurrency
+        )
         return pd.concat(geo_df_list)
 
+    # Fetch tract data within a county from each of the sources.  `county_fips`
+    # contains the counties available for each source, an empty data frame is
+    # used for sources where the county is not available.
+    def fetchCountyTractsBySource(self, sources, county, county_fips):
+        return [
+            self.fetchTractsByCounty(source, items, county, year) if county in fips else pd.DataFrame()
+            for (source, items, year), fips in zip(sources, county_fips)
+        ]
+
+    # Fetches tract data for a single county for 2000-2009
+    def fetchCountyTractData2000(self, county, county_fips):
+        sf1_df, sf3_df, acs_df = self.fetchCountyTractsBySource(SOURCES_2000, county, county_fips)
+        return postProcessData2000(sf1_df, sf3_df, acs_df, 'tracts')
+
+    # Fetches tract data for a single county for 2010-current
+    def fetchCountyTractData2010(self, county, county_fips):
+        census_df, acs_12_df, acs_df = self.fetchCountyTractsBySource(SOURCES_2010, county, county_fips)
+        return postProcessData2010(census_df, acs_12_df, acs_df, 'tracts')
+
     def fetchAllTractData2000(self):
         logger.debug('starting fetch for all tract level data for 2000-2009')
         census_sf1_df = self.fetchTracts('sf1', CENSUS_00_SF1_VARS, 2000)
@@ -444,15 +603,16 @@ class CensusDataStore:
     # Fetch data for all 2010 block groups in a county by fetching all of
     # the tracts within a county, and then looping through those tracts.
     def fetchBlockGroupsByCounty(self, source, items, county, year):
-        geo_df_list = []
         lookup_dict =  {
             'for': 'tract:*', 
             'in': 'county:' + county[2:] + ' state:' + county[0:2] 
         }
-        tract_fips = [ r for r in self.fetchResults(source, ('NAME'), lookup_dict, year=year) if r['state'] != '72' ]
-        for f in tract_fips:
-            tract = f['state'] + f['county'] + f['tract']
-            geo_df_list.append(self.fetchBlockGroupsByTract(source, items, tract, year))
+        tract_fips = [ r for r in self.geographies.get_children(source, year, lookup_dict) if r['state'] != '72' ]
+        geo_df_list = fetch_concurrently(
+            self.fetchBlockGroupsByTract,
+            [ (source, items, f['state'] + f['county'] + f['tract'], year) for f in tract_fips ],
+            self.concurrency
+        )
 
         if len(geo_df_list) > 0:
             return pd.concat(geo_df_list)
@@ -0,0 +1,75 @@
+import os
+import csv
+import shutil
+import pandas as pd
+from data_schema import get_read_dtypes
+from utils_logging import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Directory where completed partitions are stored
+CHECKPOINT_DIR = os.getenv(
+    'CENSUS_CHECKPOINT_DIR', os.path.join(BASE_DIR, 'census', 'checkpoints'))
+
+# Stores each completed partition of a fetch (e.g. a county) as a CSV file
+# so a fetch that fails part way through can resume from the last completed
+# partition.  Partitions are written to a temporary file and renamed when
+# complete, so a partition file that exists is always complete.
+class PartitionCheckpoint:
+    def __init__(self, name, checkpoint_dir=CHECKPOINT_DIR):
+        self.dir = os.path.join(checkpoint_dir, name)
+        os.makedirs(self.dir, exist_ok=True)
+
+    def path(self, partition):
+        return os.path.join(self.dir, partition + '.csv')
+
+    def is_complete(self, partition):
+        return os.path.isfile(self.path(partition))
+
+    # Writes the data frame for the partition.  An empty file is written
+    # when there is no data so the partition is not fetched again.
+    def write(self, partition, df):
+        filename = self.path(partition)
+        tmp_filename = filename + '.tmp'
+        if df is None or df.empty:
+            open(tmp_filename, 'w').close()
+        else:
+            df.to_csv(tmp_filename, index=False, quoting=csv.QUOTE_NONNUMERIC)
+        os.replace(tmp_filename, filename)
+
+    # Returns the header of the partition, or None if it has no data
+    def header(self, partition):
+        with open(self.path(partition), 'r', encoding='utf-8', newline='') as f:
+            return next(csv.reader(f), None)
+
+    # Writes all of the partitions in order to `output` as a single CSV,
+    # only holding one partition in memory at a time.  Partitions that do not
+    # have all of the columns are filled with empty values.
+    def merge(self, partitions, output):
+        headers = [self.header(p) for p in partitions]
+        columns = []
+        for header in headers:
+            for col in header or []:
+                if col not in columns:
+                    columns.append(col)
+        if not columns:
+            logger.warn('no data in any partition of ' + self.dir)
+            return
+        # pandas orders columns alphabetically when concatenating data
+        # frames with different columns
+        if any(header and header != columns for header in headers):
+            columns = sorted(columns)
+
+        csv.writer(output, quoting=csv.QUOTE_NONNUMERIC).writerow(columns)
+        for partition, header in zip(partitions, headers):
+            if header is None:
+                continue
+            if header == columns:
+                # copy the rows as they are if the columns already match
+                with open(self.path(partition), 'r', encoding='utf-8', newline='') as f:
+                    f.readline()
+                    shutil.copyfileobj(f, output)
+            else:
+                df = pd.read_csv(self.path(partition), dtype=get_read_dtypes())
+                df.reindex(columns=columns).to_csv(
+                    output, index=False, header=False, quoting=csv.QUOTE_NONNUMERIC)
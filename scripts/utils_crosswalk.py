@@ -0,0 +1,82 @@
+import os
+import pandas as pd
+from data_constants import COUNTY_CROSSWALK
+from data_schema import get_read_dtypes
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Census places that changed GEOID from 2000 to 2010
+PLACES_CROSSWALK_FILE = os.path.join(BASE_DIR, 'conf', 'changed_census_places.csv')
+
+# County changes indexed by the old county GEOID, with the new GEOID, name,
+# and parent-location
+COUNTY_CROSSWALK_DF = pd.DataFrame.from_dict(COUNTY_CROSSWALK, orient='index')
+
+
+# Loads the places crosswalk indexed by the 2000 GEOID, with the 2010 GEOID
+# and name
+def get_places_crosswalk_df(filename=PLACES_CROSSWALK_FILE):
+    df = pd.read_csv(filename, dtype=get_read_dtypes())
+    df.rename(columns={ 'GEOID10': 'GEOID', 'NAME10': 'name' }, inplace=True)
+    return df.set_index('GEOID00')[['GEOID', 'name']]
+
+
+# Remaps GEOIDs in the index of `crosswalk_df` to the crosswalk GEOID.  If
+# `prefix_len` is provided, GEOIDs that start with a GEOID in the index are
+# remapped and keep the rest of the GEOID.  `values` maps columns in the data
+# frame to a series of values indexed like `crosswalk_df`, which are set on
+# the remapped rows.
+def remap_geoids(df, crosswalk_df, values=None, prefix_len=None):
+    if 'GEOID' not in df.columns.values:
+        return df
+    if prefix_len is None:
+        prefixes = df['GEOID']
+    else:
+        prefixes = df['GEOID'].str[:prefix_len]
+    mask = prefixes.isin(crosswalk_df.index)
+    if not mask.any():
+        return df
+
+    matched = prefixes.loc[mask]
+    geoids = matched.map(crosswalk_df['GEOID'])
+    if prefix_len is not None:
+        geoids = geoids + df.loc[mask, 'GEOID'].str[prefix_len:]
+    df.loc[mask, 'GEOID'] = geoids
+    for col, col_values in (values or {}).items():
+        col_values = matched.map(col_values)
+        if df[col].dtype.name == 'category':
+            # values that are not categories yet are added before they are set
+            new_values = set(col_values.dropna()) - set(df[col].cat.categories)
+            df[col] = df[col].cat.add_categories(sorted(new_values))
+        df.loc[mask, col] = col_values
+    return df
+
+
+# Remaps changed counties, with the name and parent-location of the new
+# county if the data frame has both columns
+def crosswalk_counties(df):
+    values = {}
+    if 'name' in df.columns.values and 'parent-location' in df.columns.values:
+        values = {
+            'name': COUNTY_CROSSWALK_DF['name'],
+            'parent-location': COUNTY_CROSSWALK_DF['parent-location']
+        }
+    return remap_geoids(df, COUNTY_CROSSWALK_DF, values)
+
+
+# Remaps the county part of tract and block group GEOIDs in changed counties,
+# with the parent-location of the new county
+def crosswalk_county_children(df):
+    values = {}
+    if 'parent-location' in df.columns.values:
+        values['parent-location'] = (
+            COUNTY_CROSSWALK_DF['name'] + ', ' + COUNTY_CROSSWALK_DF['parent-location'])
+    return remap_geoids(df, COUNTY_CROSSWALK_DF, values, prefix_len=5)
+
+
+# Remaps changed places, with the name of the new place
+def crosswalk_places(df, places_df):
+    values = {}
+    if 'name' in df.columns.values:
+        values['name'] = places_df['name']
+    return remap_geoids(df, places_df, values)
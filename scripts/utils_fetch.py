@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import random
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from utils_logging import logger, create_logger
+
+# Number of Census API requests that can be in flight at once for a
+# fan-out (e.g. all counties when fetching tracts)
+FETCH_CONCURRENCY = int(os.getenv('CENSUS_CONCURRENCY', 4))
+
+# Maximum number of Census API requests per second for the process,
+# 0 disables the rate limit
+FETCH_RATE_LIMIT = float(os.getenv('CENSUS_RATE_LIMIT', 10))
+
+# Maximum number of attempts for a Census API request
+RETRY_ATTEMPTS = int(os.getenv('CENSUS_RETRY_ATTEMPTS', 10))
+
+# Base and maximum number of seconds to wait between attempts
+RETRY_BASE_DELAY = float(os.getenv('CENSUS_RETRY_BASE_DELAY', 2))
+RETRY_MAX_DELAY = float(os.getenv('CENSUS_RETRY_MAX_DELAY', 180))
+
+# Number of consecutive failed requests before all requests are paused,
+# and the number of seconds to pause for
+BREAKER_THRESHOLD = 5
+BREAKER_TIMEOUT = 60
+
+# HTTP status codes other than server errors that should be retried
+RETRY_STATUS_CODES = [408, 429]
+
+# logs one JSON record per retry to `log/fetch_metrics.txt`
+metrics_logger = create_logger(
+    'fetch_metrics', console_lvl=None, file_lvl='INFO', fmt='%(message)s')
+
+
+# Token bucket that limits how often requests can be started.  The
+# same limiter is shared by all worker threads so the limit applies to
+# the process as a whole.
+class RateLimiter:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate or 0)
+        self.capacity = float(burst or max(self.rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Blocks until a request is allowed to start
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Calls `func` with each tuple of arguments in `args_list` using up to
+# `concurrency` threads.  Results are returned in the same order as
+# `args_list` so output is deterministic regardless of completion order.
+def fetch_concurrently(func, args_list, concurrency=FETCH_CONCURRENCY):
+    args_list = list(args_list)
+    if concurrency <= 1 or len(args_list) <= 1:
+        return [func(*args) for args in args_list]
+    workers = min(concurrency, len(args_list))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda args: func(*args), args_list))
+
+
+# Pauses all requests when the Census API appears to be down.  After
+# `threshold` consecutive failures the breaker opens and requests wait for
+# `timeout` seconds.  The first request after that is sent as a probe, if it
+# succeeds requests resume, if it fails the breaker opens again.
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, timeout=BREAKER_TIMEOUT):
+        self.threshold = threshold
+        self.timeout = timeout
+        self.failures = 0
+        self.state = 'closed'
+        self.open_until = 0
+        self.condition = threading.Condition()
+
+    # Blocks while the breaker is open or another request is probing the API
+    def acquire(self):
+        with self.condition:
+            while True:
+                if self.state == 'closed':
+                    return
+                now = time.monotonic()
+                if self.state == 'open' and now >= self.open_until:
+                    # this request is the probe
+                    self.state = 'half-open'
+                    self.open_until = now + self.timeout
+                    return
+                if self.state == 'half-open' and now >= self.open_until:
+                    # the probe never reported back, send another one
+                    self.open_until = now + self.timeout
+                    return
+                self.condition.wait(max(self.open_until - now, 0.01))
+
+    def record_success(self):
+        with self.condition:
+            if self.state != 'closed':
+                logger.info('Census API is responding, resuming requests')
+            self.failures = 0
+            self.state = 'closed'
+            self.condition.notify_all()
+
+    def record_failure(self):
+        with self.condition:
+            self.failures += 1
+            if self.state == 'half-open' or (
+                    self.state == 'closed' and self.failures >= self.threshold):
+                logger.warn(
+                    'Census API failed ' + str(self.failures) +
+                    ' requests in a row, pausing requests for ' +
+                    str(self.timeout) + ' seconds')
+                self.state = 'open'
+                self.open_until = time.monotonic() + self.timeout
+                self.condition.notify_all()
+
+
+# circuit breaker shared by all requests in the process
+CIRCUIT_BREAKER = CircuitBreaker()
+
+
+# Decides which failed requests are retried and how long to wait between
+# attempts.  Rate limits (429), timeouts, server errors (5xx), and connection
+# errors are retried with exponential backoff and full jitter.  Other client
+# errors (4xx, e.g. unknown variables) fail on the first attempt.
+class RetryPolicy:
+    def __init__(self, max_attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, circuit_breaker=CIRCUIT_BREAKER):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.circuit_breaker = circuit_breaker
+
+    def is_retryable(self, error):
+        status_code = getattr(error, 'status_code', None)
+        if status_code is not None:
+            return status_code >= 500 or status_code in RETRY_STATUS_CODES
+        # connection errors, timeouts, and truncated responses
+        return isinstance(error, (requests.RequestException, ValueError))
+
+    # Number of seconds to wait after the given (1-based) attempt
+    def backoff(self, attempt):
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    # Calls `func` until it succeeds, the error is not retryable, or the max
+    # attempts are reached.  The last error is raised if all attempts fail.
+    # `context` is a dict describing the request that is added to metrics.
+    def call(self, func, context=None):
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.circuit_breaker:
+                self.circuit_breaker.acquire()
+            try:
+                result = func()
+            except Exception as error:
+                retryable = self.is_retryable(error)
+                if self.circuit_breaker:
+                    # client errors mean the API is up
+                    if retryable:
+                        self.circuit_breaker.record_failure()
+                    else:
+                        self.circuit_breaker.record_success()
+                if not retryable or attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt)
+                self.record_retry(context, attempt, error, delay)
+                time.sleep(delay)
+            else:
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_success()
+                return result
+
+    # Writes a metric record for a retry
+    def record_retry(self, context, attempt, error, delay):
+        record = {
+            'event': 'retry',
+            'time': time.time(),
+            'attempt': attempt,
+            'error': type(error).__name__,
+            'status_code': getattr(error, 'status_code', None),
+            'delay': round(delay, 3),
+        }
+        record.update(context or {})
+        metrics_logger.info(json.dumps(record, sort_keys=True))
+        logger.debug(
+            'received ' + type(error).__name__ + ' on attempt ' + str(attempt) +
+            ', retrying in ' + str(round(delay, 1)) + ' seconds: ' + str(error))
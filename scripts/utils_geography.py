@@ -0,0 +1,84 @@
+import os
+import json
+import threading
+from collections import defaultdict
+from utils_logging import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Directory where lists of child geographies are stored
+GEOGRAPHY_DIR = os.getenv(
+    'CENSUS_GEOGRAPHY_DIR', os.path.join(BASE_DIR, 'census', 'geographies'))
+
+# Map of Census API source and year to the geography vintage it uses.
+# Sources that share a vintage have the same geographies, so the list of
+# child geographies only needs to be fetched once for all of them.
+GEOGRAPHY_VINTAGES = {
+    ('sf1', 2000): 'census-2000',
+    ('sf3', 2000): 'census-2000',
+    ('acs5', 2009): 'acs-2009',
+    ('sf1', 2010): 'census-2010',
+    ('acs5', 2012): 'acs-2012',
+    ('acs5', 2015): 'acs-2015',
+}
+
+# geography code columns returned by the Census API
+GEOGRAPHY_COLS = ['state', 'county', 'place', 'tract', 'block group']
+
+
+# Lists the child geographies within a parent geography (e.g. all tracts in
+# a county) for a geography vintage.  Each list is fetched from the Census
+# API once and kept in memory and on disk, so all sources and processes that
+# use the same vintage reuse it.
+class GeographyIndex:
+    def __init__(self, fetch_results, index_dir=GEOGRAPHY_DIR):
+        self.fetch_results = fetch_results
+        self.index_dir = index_dir
+        self.children = {}
+        self.lock = threading.Lock()
+        self.key_locks = defaultdict(threading.Lock)
+
+    def vintage(self, source, year):
+        return GEOGRAPHY_VINTAGES.get((source, year), source + '-' + str(year))
+
+    def path(self, vintage, lookup_dict):
+        # e.g. `tract_county-001_state-01.json` for all tracts in a county
+        name = ' '.join([lookup_dict['for'].split(':')[0], lookup_dict.get('in', '')])
+        name = name.strip().replace('*', 'all').replace(':', '-').replace(' ', '_')
+        return os.path.join(self.index_dir, vintage, name + '.json')
+
+    # Returns a list of dicts with the geography codes of each child geography
+    # for the `for` and `in` clauses in `lookup_dict`
+    def get_children(self, source, year, lookup_dict):
+        vintage = self.vintage(source, year)
+        key = (vintage, lookup_dict['for'], lookup_dict.get('in', ''))
+        with self.lock:
+            key_lock = self.key_locks[key]
+        # only one thread fetches each list, others wait for it
+        with key_lock:
+            if key not in self.children:
+                self.children[key] = self.load(source, year, vintage, lookup_dict)
+        return self.children[key]
+
+    # Loads the list from disk, or fetches it if it has not been stored
+    def load(self, source, year, vintage, lookup_dict):
+        filename = self.path(vintage, lookup_dict)
+        if os.path.isfile(filename):
+            with open(filename, 'r') as f:
+                return json.load(f)
+
+        results = self.fetch_results(source, ('NAME'), lookup_dict, year=year)
+        if results is None:
+            raise Exception(
+                'could not fetch ' + vintage + ' geographies for ' + str(lookup_dict))
+        children = [
+            {col: r[col] for col in GEOGRAPHY_COLS if col in r} for r in results
+        ]
+
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = filename + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            json.dump(children, f)
+        os.replace(tmp_filename, filename)
+        logger.debug('stored ' + str(len(children)) + ' ' + vintage + ' geographies for ' + str(lookup_dict))
+        return children
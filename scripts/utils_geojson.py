@@ -0,0 +1,143 @@
+import os
+import json
+import shutil
+import tempfile
+
+# Number of characters read at a time from GeoJSON files
+READ_SIZE = 1024 * 1024
+
+
+# Reads JSON values one at a time from a file, so large arrays (like the
+# features of a GeoJSON feature collection) can be processed without
+# loading the whole file.  Values are decoded with the same decoder as
+# `json.load`.
+class JSONStreamReader:
+    def __init__(self, f, read_size=READ_SIZE):
+        self.f = f
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    # Reads more of the file into the buffer, dropping consumed characters.
+    # Returns False at the end of the file.
+    def fill(self, size=None):
+        if self.eof:
+            return False
+        data = self.f.read(size or self.read_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    # Returns the next character that is not whitespace without consuming it,
+    # or an empty string at the end of the file
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    # Consumes the next character that is not whitespace, which must be one
+    # of `chars`, and returns it
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                'expected one of ' + repr(chars) + ' but found ' + repr(char))
+        self.pos += 1
+        return char
+
+    # Decodes the next JSON value.  If the value reaches the end of the buffer
+    # more is read until the value is complete, so numbers are not cut off.
+    def read_value(self):
+        self.peek()
+        size = self.read_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # read larger blocks for large values so decoding is not
+            # repeated too many times
+            self.fill(size)
+            size *= 2
+
+
+# Splits a GeoJSON feature collection into several collections in one pass,
+# reading one feature at a time.  `route(feature)` returns the feature to
+# write and the keys of the files in `out_files` to write it to.  Other
+# members of the collection are copied to every file.  Each file is the
+# same as `json.dump` of a collection with the features routed to it.
+def split_feature_collection(in_file, out_files, route):
+    def write_all(text):
+        for out_file in out_files.values():
+            out_file.write(text)
+
+    reader = JSONStreamReader(in_file)
+    reader.expect('{')
+    write_all('{')
+    first_member = True
+    while reader.peek() != '}':
+        if not first_member:
+            reader.expect(',')
+            write_all(', ')
+        key = reader.read_value()
+        reader.expect(':')
+        write_all(json.dumps(key) + ': ')
+        if key == 'features' and reader.peek() == '[':
+            reader.expect('[')
+            write_all('[')
+            # keys of files that have features written
+            written = set()
+            first_feature = True
+            while reader.peek() != ']':
+                if not first_feature:
+                    reader.expect(',')
+                feat, keys = route(reader.read_value())
+                text = json.dumps(feat)
+                for k in keys:
+                    if k in written:
+                        out_files[k].write(', ')
+                    else:
+                        written.add(k)
+                    out_files[k].write(text)
+                first_feature = False
+            reader.expect(']')
+            write_all(']')
+        else:
+            write_all(json.dumps(reader.read_value()))
+        first_member = False
+    reader.expect('}')
+    write_all('}')
+
+
+# Rewrites a GeoJSON feature collection one feature at a time, writing
+# `rewrite(feature)` for every feature.  Other members of the collection are
+# copied.  Output is the same as `json.dump` of the rewritten collection.
+def rewrite_feature_collection(in_file, out_file, rewrite):
+    split_feature_collection(
+        in_file, { None: out_file }, lambda feat: (rewrite(feat), [None]))
+
+
+# Rewrites the features of a GeoJSON file in place, through a temporary file
+# in the same directory that replaces the original when complete
+def rewrite_geojson_file(filename, rewrite):
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filename)), suffix='.geojson')
+    try:
+        with open(filename, 'r') as in_file, os.fdopen(fd, 'w') as out_file:
+            rewrite_feature_collection(in_file, out_file, rewrite)
+        shutil.copymode(filename, tmp_filename)
+        os.replace(tmp_filename, filename)
+    finally:
+        if os.path.isfile(tmp_filename):
+            os.remove(tmp_filename)
@@ -0,0 +1,232 @@
+import io
+import os
+import pandas as pd
+from data_schema import (
+    get_read_dtypes, compact_dtypes, has_compact_dtypes, expand_dtypes)
+
+# Format of data written between steps of the pipeline: "csv", "arrow"
+# (Arrow IPC stream), or "parquet".  Data is read in any of the formats,
+# the format is detected from the first bytes.
+DATA_FORMAT = os.getenv('DATA_FORMAT', 'csv')
+DATA_FORMATS = ['csv', 'arrow', 'parquet']
+
+# Arrow IPC stream messages start with a continuation marker, Parquet files
+# start with a magic number
+ARROW_STREAM_MARKER = b'\xff\xff\xff\xff'
+PARQUET_MAGIC = b'PAR1'
+
+# Number of rows of data with compact types converted back at a time when
+# they are written
+WRITE_CHUNK_SIZE = int(os.getenv('DATA_WRITE_CHUNK_SIZE', 100000))
+
+
+# Returns the binary stream of a text stream like stdin, or the stream
+def get_binary_stream(f):
+    return getattr(f, 'buffer', f)
+
+
+# Detects the format of a file path or stream without consuming the stream
+def detect_format(source):
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            head = f.read(4)
+    else:
+        f = get_binary_stream(source)
+        if not hasattr(f, 'peek'):
+            return 'csv'
+        head = f.peek(4)[:4]
+    if head == PARQUET_MAGIC:
+        return 'parquet'
+    if head and ARROW_STREAM_MARKER.startswith(head):
+        return 'arrow'
+    return 'csv'
+
+
+# Converts columns read from Arrow or Parquet data the same way `pd.read_csv`
+# does, so data frames are the same in every format.  Columns in `dtype` are
+# converted to that type, with values of object columns as strings as they
+# are written in a CSV file.  Other string columns are numbers if all of the
+# values are numbers, as they are when CSV columns are inferred.
+def apply_dtypes(df, dtype):
+    dtype = dtype or {}
+    for col in df.columns:
+        col_dtype = dtype.get(col)
+        if col_dtype in ['object', object, str]:
+            df[col] = df[col].astype(str).where(df[col].notnull())
+        elif col_dtype is not None:
+            df[col] = df[col].astype(col_dtype)
+        elif df[col].dtype.kind == 'O':
+            try:
+                df[col] = pd.to_numeric(df[col])
+            except (ValueError, TypeError):
+                pass
+    return df
+
+
+# Splits Arrow record batches into data frames of at most `chunksize` rows
+def iter_batch_frames(batches, dtype, chunksize):
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunksize or batch.num_rows or 1):
+            rows = batch.slice(start, chunksize or batch.num_rows)
+            yield apply_dtypes(rows.to_pandas(), dtype)
+
+
+# Reads record batches from Arrow IPC streams.  A stream is started again
+# when data no longer matches the schema, so the streams are read until the
+# end of the input.
+def iter_arrow_batches(source):
+    import pyarrow as pa
+    is_path = isinstance(source, str)
+    f = open(source, 'rb') if is_path else get_binary_stream(source)
+    try:
+        while detect_format(f) == 'arrow':
+            for batch in pa.ipc.open_stream(f):
+                yield batch
+    finally:
+        if is_path:
+            f.close()
+
+
+def iter_parquet_batches(source):
+    import pyarrow.parquet as pq
+    if not isinstance(source, str):
+        # Parquet metadata is at the end of the file, so streams are read
+        # into memory
+        source = io.BytesIO(get_binary_stream(source).read())
+    parquet_file = pq.ParquetFile(source)
+    for i in range(parquet_file.num_row_groups):
+        for batch in parquet_file.read_row_group(i).to_batches():
+            yield batch
+
+
+# Reads data from a file path or stream in any format.  Returns a data frame,
+# or an iterator of data frames with up to `chunksize` rows if `chunksize` is
+# set.  Columns have the compact types in `data_schema`, except the columns
+# in `dtype` which have that type.  Other arguments are passed to
+# `pd.read_csv` for CSV data.
+def read_data(source, dtype=None, chunksize=None, **kwargs):
+    skip = dtype or {}
+    dtype = get_read_dtypes(dtype)
+    data_format = detect_format(source)
+    if data_format == 'csv':
+        frames = pd.read_csv(source, dtype=dtype, chunksize=chunksize, **kwargs)
+        if chunksize:
+            return (compact_dtypes(df, skip) for df in frames)
+        return compact_dtypes(frames, skip)
+    if data_format == 'arrow':
+        batches = iter_arrow_batches(source)
+    else:
+        batches = iter_parquet_batches(source)
+    frames = iter_batch_frames(batches, dtype, chunksize)
+    if chunksize:
+        return (compact_dtypes(df, skip) for df in frames)
+    return concat_data(frames, skip)
+
+
+# Combines data frames read in chunks into a single data frame with compact
+# types, except the columns in `skip`.  Categories are converted again after
+# the chunks are combined, because chunks with different categories are
+# combined as strings.
+def concat_data(frames, skip=()):
+    frames = list(frames)
+    if not frames:
+        raise ValueError('no data to read')
+    if len(frames) == 1:
+        return compact_dtypes(frames[0], skip)
+    return compact_dtypes(pd.concat(frames, ignore_index=True), skip)
+
+
+# Writes data frames to a stream in `data_format` (DATA_FORMAT by default),
+# one data frame at a time.  The CSV header is only written for the first
+# data frame, and other arguments are passed to `to_csv` for CSV data.  The
+# index is written as columns if `index` is True.  Columns with compact types
+# are written with the types they were read with.
+class DataWriter:
+    def __init__(self, f, data_format=None, index=False, **kwargs):
+        self.data_format = data_format or DATA_FORMAT
+        if self.data_format not in DATA_FORMATS:
+            raise ValueError('unknown data format: ' + self.data_format)
+        self.f = f
+        self.index = index
+        self.csv_kwargs = kwargs
+        self.header = True
+        self.schema = None
+        self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Writes a data frame, converting compact types back a slice of rows at a
+    # time so the data is not copied all at once
+    def write(self, df):
+        if not has_compact_dtypes(df):
+            return self.write_frame(df)
+        for start in range(0, max(len(df), 1), WRITE_CHUNK_SIZE):
+            self.write_frame(
+                expand_dtypes(df.iloc[start:start + WRITE_CHUNK_SIZE]))
+
+    def write_frame(self, df):
+        if self.data_format == 'csv':
+            df.to_csv(
+                self.f, index=self.index, header=self.header, **self.csv_kwargs)
+            self.header = False
+            return
+        import pyarrow as pa
+        if self.index:
+            df = df.reset_index()
+        if self.schema is None:
+            self.start(df)
+        try:
+            table = pa.Table.from_pandas(
+                df, schema=self.schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Arrow streams start again with the types of this data frame,
+            # as they would be read from the next chunk of a CSV file
+            if self.data_format != 'arrow':
+                raise ValueError(
+                    'data does not match the types of the first data written')
+            self.writer.close()
+            self.start(df)
+            table = pa.Table.from_pandas(
+                df, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    # Starts a stream with the schema of a data frame.  Columns with only
+    # missing values have no type in Arrow, so they are strings if they are
+    # objects or floats otherwise.
+    def start(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.Table.from_pandas(df, preserve_index=False).schema
+        self.schema = pa.schema([
+            field if field.type != pa.null() else pa.field(
+                field.name,
+                pa.string() if df[field.name].dtype == object else pa.float64())
+            for field in schema
+        ])
+        # text written to the stream before switching to binary
+        self.f.flush()
+        sink = get_binary_stream(self.f)
+        if self.data_format == 'arrow':
+            self.writer = pa.ipc.new_stream(sink, self.schema)
+        else:
+            self.writer = pq.ParquetWriter(sink, self.schema)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.f.flush()
+
+
+# Writes a data frame to a file path or stream in `data_format` (DATA_FORMAT
+# by default)
+def write_data(df, f, data_format=None, index=False, **kwargs):
+    if isinstance(f, str):
+        with open(f, 'w', newline='') as out_file:
+            return write_data(df, out_file, data_format, index, **kwargs)
+    with DataWriter(f, data_format, index, **kwargs) as writer:
+        writer.write(df)
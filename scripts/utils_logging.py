@@ -1,10 +1,11 @@
 import logging
 
 # Provides a simple logger for logging to the console and/or file
-def create_logger(name, console_lvl='DEBUG', file_lvl=None):
+def create_logger(name, console_lvl='DEBUG', file_lvl=None,
+                  fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s'):
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    formatter = logging.Formatter(fmt)
 
     # create file handler which logs even debug messages
     if file_lvl:
@@ -0,0 +1,77 @@
+import os
+import threading
+import boto3
+from botocore.client import Config
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
+from utils_logging import logger
+
+# Endpoint for S3 requests, set to use a local S3 stand-in instead of AWS
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
+
+# Number of files uploaded at once, and the number of parts uploaded at once
+# for each file that is large enough for a multipart upload
+UPLOAD_CONCURRENCY = int(os.getenv('S3_UPLOAD_CONCURRENCY', 8))
+UPLOAD_PART_CONCURRENCY = int(os.getenv('S3_UPLOAD_PART_CONCURRENCY', 4))
+
+# Files larger than this are uploaded in parts of this size (in MB)
+MULTIPART_SIZE = int(os.getenv('S3_MULTIPART_SIZE', 16)) * 1024 * 1024
+
+
+# Creates an S3 client, using path style addresses for a local S3 stand-in
+def create_s3_client(endpoint_url=S3_ENDPOINT_URL):
+    if endpoint_url:
+        return boto3.client(
+            's3', endpoint_url=endpoint_url,
+            config=Config(s3={ 'addressing_style': 'path' }))
+    return boto3.client('s3')
+
+
+# Uploads files to an S3 bucket in a bounded pool of threads.  `upload`
+# blocks while `concurrency` uploads are running and `concurrency` more are
+# waiting, so files waiting to be uploaded do not pile up on disk.  Files
+# larger than `multipart_size` are sent as multipart uploads.
+class S3Uploader:
+    def __init__(self, bucket, client=None, concurrency=UPLOAD_CONCURRENCY,
+                 multipart_size=MULTIPART_SIZE,
+                 part_concurrency=UPLOAD_PART_CONCURRENCY):
+        self.bucket = bucket
+        self.client = client or create_s3_client()
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_size,
+            multipart_chunksize=multipart_size,
+            max_concurrency=part_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.slots = threading.BoundedSemaphore(concurrency * 2)
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.executor.shutdown(wait=True)
+
+    # Starts uploading a file to `key`, the file is removed after it is
+    # uploaded if `remove` is True
+    def upload(self, filename, key, remove=False):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self.upload_file, filename, key, remove)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda f: self.slots.release())
+        self.futures.append(future)
+
+    def upload_file(self, filename, key, remove):
+        self.client.upload_file(
+            filename, self.bucket, key, Config=self.transfer_config)
+        logger.debug('uploaded ' + filename + ' to s3://' + self.bucket + '/' + key)
+        if remove:
+            os.remove(filename)
+
+    # Waits for all uploads to finish, raising the first error
+    def wait(self):
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
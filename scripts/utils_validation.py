@@ -1,3 +1,4 @@
+import os
 import sys
 import time
 import numpy as np
@@ -12,41 +13,75 @@ def is_clean_left_merge(df_left, df_right, col):
         return True
     return False
 
-# Gets stats on left merge
-def get_left_merge_stats(df_left, df_right, **kwargs):
+# Maximum number of unmatched entries kept in merge stats and written to
+# the log, the number of unmatched entries is always counted
+MAX_UNMATCHED_ENTRIES = int(os.getenv('MERGE_STATS_MAX_UNMATCHED', 25))
 
+# Gets the key columns for each side of a merge from the merge arguments
+def get_merge_keys(**kwargs):
     if 'on' in kwargs:
         cols = kwargs.get('on')
         if isinstance(cols, str):
-            # if single column is provided to merge on, set it as the key
-            left_key = cols
-            right_key = cols
+            return [cols], [cols]
         elif isinstance(cols,(list,)):
-            # if multiple columns create a merge key by joining all provided columns
-            left_key = right_key = 'merge_key'
-            df_left = df_left[cols].copy()
-            df_right = df_right[cols].copy()
-            df_left[left_key] = df_left[cols].apply(lambda row: ''.join(row.values.astype(str)), axis=1)
-            df_right[right_key] = df_right[cols].apply(lambda row: ''.join(row.values.astype(str)), axis=1)
+            return cols, cols
+        raise ValueError('column name(s) for merge stats must be a string or list of strings')
+    left_key = kwargs.get('left_on')
+    right_key = kwargs.get('right_on')
+    if isinstance(left_key, str):
+        return [left_key], [right_key]
+    return list(left_key), list(right_key)
+
+# Hashes the merge key of each row of both data frames.  Key columns that
+# have different types in each data frame are compared as floats if both
+# are numeric, otherwise as strings.
+def hash_merge_keys(df_left, df_right, left_cols, right_cols):
+    left_df = df_left[left_cols].copy()
+    right_df = df_right[right_cols].copy()
+    left_df.columns = right_df.columns = range(len(left_cols))
+    for col in left_df.columns:
+        if left_df[col].dtype == right_df[col].dtype:
+            continue
+        if left_df[col].dtype.kind in 'iuf' and right_df[col].dtype.kind in 'iuf':
+            left_df[col] = left_df[col].astype('float64')
+            right_df[col] = right_df[col].astype('float64')
         else:
-            raise ValueError('column name(s) for merge stats must be a string or list of strings')
-    
-    if 'left_on' in kwargs and 'right_on' in kwargs:
-        left_key = kwargs.get('left_on')
-        right_key = kwargs.get('right_on')
+            left_df[col] = left_df[col].astype(str)
+            right_df[col] = right_df[col].astype(str)
+    return (
+        pd.util.hash_pandas_object(left_df, index=False).values,
+        pd.util.hash_pandas_object(right_df, index=False).values
+    )
+
+# Creates the merge key of the rows at the positions in the data frame,
+# multiple columns are joined into one string
+def format_merge_keys(df, cols, rows):
+    keys_df = df[cols].iloc[rows]
+    if len(cols) == 1:
+        return keys_df[cols[0]].tolist()
+    keys = keys_df[cols[0]].astype(str)
+    for col in cols[1:]:
+        keys = keys + keys_df[col].astype(str)
+    return keys.tolist()
 
-    set1 = set(df_left[left_key])
-    set2 = set(df_right[right_key])
+# Gets stats on left merge.  Merge keys are compared by hash, and at most
+# MAX_UNMATCHED_ENTRIES of the unmatched keys in the right data frame are
+# returned, in the order they appear.
+def get_left_merge_stats(df_left, df_right, **kwargs):
+    left_cols, right_cols = get_merge_keys(**kwargs)
+    left_hashes, right_hashes = hash_merge_keys(df_left, df_right, left_cols, right_cols)
 
-    matchedEntries = set2.intersection(set1)
-    unmatchedEntries = set2.difference(set1)
+    left_unique = np.unique(left_hashes)
+    right_unique, right_rows = np.unique(right_hashes, return_index=True)
+    matched = np.isin(right_unique, left_unique, assume_unique=True)
+    unmatched_rows = np.sort(right_rows[~matched])[:MAX_UNMATCHED_ENTRIES]
 
     results = {
-        'df1_entries': len(set1),
-        'df2_entries': len(set2),
-        'matched': len(matchedEntries),
-        'unmatched': len(unmatchedEntries),
-        'unmatchedEntries': list(unmatchedEntries)
+        'df1_entries': len(left_unique),
+        'df2_entries': len(right_unique),
+        'matched': int(matched.sum()),
+        'unmatched': int((~matched).sum()),
+        'unmatchedEntries': format_merge_keys(df_right, right_cols, unmatched_rows)
     }
 
     return results
@@ -62,13 +97,27 @@ def log_merge_stats(name, stats):
         logger.warn(
             name + ': merged ' + str(matched) + ' of ' + str(total) + 
             ' rows ('+ str(percent) + '%). There were ' + str(stats['unmatched']) + 
-            ' unmatched entries: ' + ','.join(str(e) for e in unmatched)
+            ' unmatched entries: ' + ','.join(str(e) for e in unmatched) +
+            (',...' if stats['unmatched'] > len(unmatched) else '')
         )
     else:
         logger.debug(name + ': merge successful')
 
+# Adds merge stats for a block of rows to the stats for previous blocks,
+# blocks must not share any keys
+def add_merge_stats(total, stats):
+    if total is None:
+        return stats
+    results = { k: total[k] + stats[k] for k in total }
+    results['unmatchedEntries'] = results['unmatchedEntries'][:MAX_UNMATCHED_ENTRIES]
+    return results
+
 def log_dem_eviction_comparison(name, df_left, df_right, **kwargs):
     stats = get_left_merge_stats(df_left, df_right, **kwargs)
+    log_dem_eviction_stats(name, stats)
+
+# Writes merge stats of demographics <- eviction data to the logger
+def log_dem_eviction_stats(name, stats):
     matched = stats['matched']
     unmatched = stats['unmatchedEntries']
     total = stats['df2_entries']
@@ -79,7 +128,8 @@ def log_dem_eviction_comparison(name, df_left, df_right, **kwargs):
             name + ' comparison: matched ' + str(matched) + ' of ' + str(total) + 
             ' rows ('+ str(percent) + '%). There are ' + str(stats['unmatched']) + 
             ' eviction data entries without matching demographics records: ' + 
-            ','.join((str(e)[:-4] + '-' + str(e)[-4:]) for e in unmatched)
+            ','.join((str(e)[:-4] + '-' + str(e)[-4:]) for e in unmatched) +
+            (',...' if stats['unmatched'] > len(unmatched) else '')
         )
     else:
         logger.debug(name + ' comparison: clean merge')
@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+import pandas as pd
+from data_schema import get_read_dtypes
+from utils_logging import logger
+
+# Number of rows read at a time from the geographic correspondence and
+# block crosswalk files
+CHUNK_SIZE = int(os.getenv('WEIGHTS_CHUNK_SIZE', 1000000))
+
+# Number of characters to slice off of block GEOIDs to get the GEOID for
+# each geography level
+GEOID_SLICES = { 'tracts': -4, 'block-groups': -3 }
+
+GEOCORR_DTYPES = {
+    'county': 'object',
+    'tract': 'object',
+    'bg': 'object',
+    'block': 'object',
+    'pop2k': 'float64'
+}
+
+
+# Combines geography levels in the 2000 geographic correspondence file to
+# create block level GEOIDs (GEOID00) and the GEOID of each geography level
+def add_geocorr_geoids(geocorr_df):
+    tract = geocorr_df['county'] + geocorr_df['tract'].str.replace('.', '')
+    geocorr_df['GEOID00'] = tract + geocorr_df['block']
+    geocorr_df['tracts'] = tract
+    geocorr_df['block-groups'] = tract + geocorr_df['bg']
+    return geocorr_df
+
+
+# Appends the rows of the data frame to a CSV file for each partition
+def write_partitions(df, partitions, partition_dir):
+    for partition, part_df in df.groupby(partitions, sort=False):
+        filename = os.path.join(partition_dir, partition + '.csv')
+        part_df.to_csv(
+            filename, mode='a', index=False, header=not os.path.isfile(filename))
+
+
+# Builds the weights for mapping 2000 data to 2010 geography for tracts and
+# block groups with a single pass over the block crosswalk.  Both inputs are
+# split into county partitions on disk so only one county is in memory at a
+# time:
+#
+#   1. the geographic correspondence file is partitioned by county while the
+#      2000 population of each tract and block group is summed, which is used
+#      to recalculate allocation factors (see `recalc_afacts.py`)
+#   2. the block crosswalk is partitioned by 2010 county, so all blocks in a
+#      2010 tract or block group are in the same partition
+#   3. weights for each level are calculated one partition at a time
+class WeightsBuilder:
+    def __init__(self, levels, chunk_size=CHUNK_SIZE):
+        for level in levels:
+            if level not in GEOID_SLICES:
+                raise ValueError('Invalid geography string supplied')
+        self.levels = levels
+        self.chunk_size = chunk_size
+
+    # Returns a dict with a data frame of weights for each level
+    def build(self, geocorr_file, crosswalk_file):
+        tmp_dir = tempfile.mkdtemp(prefix='weights-')
+        try:
+            geocorr_dir = os.path.join(tmp_dir, 'geocorr')
+            crosswalk_dir = os.path.join(tmp_dir, 'crosswalk')
+            os.makedirs(geocorr_dir)
+            os.makedirs(crosswalk_dir)
+            totals = self.partition_geocorr(geocorr_file, geocorr_dir)
+            self.partition_crosswalk(crosswalk_file, crosswalk_dir)
+
+            results = { level: [] for level in self.levels }
+            for name in sorted(os.listdir(crosswalk_dir)):
+                crosswalk_df = pd.read_csv(
+                    os.path.join(crosswalk_dir, name), dtype=get_read_dtypes())
+                geocorr_df = self.read_geocorr(
+                    geocorr_dir, crosswalk_df['GEOID00'].str[:5].unique())
+                for level, weights_df in self.create_weights(crosswalk_df, geocorr_df, totals).items():
+                    results[level].append(weights_df)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return {
+            level: pd.concat(dfs).sort_values(['GEOID00', 'GEOID10']).reset_index(drop=True)
+            for level, dfs in results.items()
+        }
+
+    # Partitions the geographic correspondence file by county and returns
+    # the total 2000 population for each tract and block group
+    def partition_geocorr(self, geocorr_file, partition_dir):
+        totals = { level: pd.Series(dtype='float64') for level in self.levels }
+        reader = pd.read_csv(
+            geocorr_file, dtype=get_read_dtypes(GEOCORR_DTYPES),
+            usecols=list(GEOCORR_DTYPES.keys()),
+            chunksize=self.chunk_size)
+        for chunk in reader:
+            chunk = add_geocorr_geoids(chunk)
+            for level in self.levels:
+                totals[level] = totals[level].add(
+                    chunk.groupby(level)['pop2k'].sum(), fill_value=0)
+            write_partitions(
+                chunk[['GEOID00', 'pop2k'] + self.levels], chunk['county'], partition_dir)
+        logger.debug('partitioned geographic correspondence file ' + geocorr_file)
+        return totals
+
+    # Partitions the block crosswalk by 2010 county
+    def partition_crosswalk(self, crosswalk_file, partition_dir):
+        reader = pd.read_csv(
+            crosswalk_file, dtype=get_read_dtypes(),
+            usecols=['GEOID00', 'GEOID10', 'WEIGHT'], chunksize=self.chunk_size)
+        for chunk in reader:
+            write_partitions(chunk, chunk['GEOID10'].str[:5], partition_dir)
+        logger.debug('partitioned block crosswalk ' + crosswalk_file)
+
+    # Reads the geographic correspondence partitions for the counties
+    def read_geocorr(self, partition_dir, counties):
+        dfs = [
+            pd.read_csv(
+                os.path.join(partition_dir, county + '.csv'),
+                dtype=get_read_dtypes({ level: 'object' for level in self.levels }))
+            for county in counties
+            if os.path.isfile(os.path.join(partition_dir, county + '.csv'))
+        ]
+        if len(dfs) > 0:
+            return pd.concat(dfs)
+        df = pd.DataFrame(columns=['GEOID00', 'pop2k'] + self.levels)
+        return df.astype({ 'pop2k': 'float64' })
+
+    # Creates weights for each level for the blocks in one partition of the
+    # crosswalk
+    def create_weights(self, crosswalk_df, geocorr_df, totals):
+        # recalculate allocation factors for each level, then sum the
+        # population and allocation factors for blocks listed more than once
+        afact_cols = [ 'afact_' + level for level in self.levels ]
+        for level, col in zip(self.levels, afact_cols):
+            geocorr_df[col] = geocorr_df['pop2k'] / geocorr_df[level].map(totals[level])
+        blocks_df = geocorr_df.groupby('GEOID00')[['pop2k'] + afact_cols].sum()
+
+        # join crosswalk with geo correspondence using the year 2000 full block GEOID
+        crosswalk_join = crosswalk_df.merge(
+            blocks_df, left_on='GEOID00', right_index=True, how='left')
+        crosswalk_join.fillna(0, inplace=True)
+        crosswalk_join[['pop2k'] + afact_cols] = crosswalk_join[['pop2k'] + afact_cols].astype('float64')
+
+        # calculate 2010 block populations by multiplying 2000 population by weight
+        crosswalk_join['pop_10'] = crosswalk_join['pop2k'] * crosswalk_join['WEIGHT']
+
+        weights = {}
+        for level, col in zip(self.levels, afact_cols):
+            geoid_slice = GEOID_SLICES[level]
+            # trim block level GEOIDs to the geography level and calculate
+            # the weight to use when crosswalking counts
+            level_df = pd.DataFrame({
+                'GEOID00': crosswalk_join['GEOID00'].str[:geoid_slice],
+                'GEOID10': crosswalk_join['GEOID10'].str[:geoid_slice],
+                'pop_10': crosswalk_join['pop_10'],
+                'count_weight': crosswalk_join['WEIGHT'] * crosswalk_join[col]
+            })
+            # calculate rate weights using the total 2010 population of the geography
+            total_pop_10 = level_df.groupby('GEOID10')['pop_10'].transform('sum')
+            level_df['rate_weight'] = (level_df['pop_10'] / total_pop_10).fillna(0)
+            weights[level] = pd.DataFrame(
+                level_df.groupby(
+                    ['GEOID00', 'GEOID10'])[['rate_weight', 'count_weight']].sum()).reset_index()
+        return weights
@@ -12,6 +12,9 @@ import sys
 import csv
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_schema import get_read_dtypes
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 PUBLIC_DATA_DIR = os.path.join(BASE_DIR, 'data', 'public', 'US')
 EVICTIONS_DATA_DIR = os.path.join(BASE_DIR, 'data', 'full-evictions')
@@ -25,17 +28,17 @@ if __name__ == '__main__':
   # load data frame with eviction records
   evictions_df = pd.read_csv(
     os.path.join(EVICTIONS_DATA_DIR, filename),
-    dtype = { 'GEOID': 'object' })
+    dtype = get_read_dtypes())
 
   # load data frame with demographic records
   demographics_df = pd.read_csv(
     os.path.join(DEMOGRAPHICS_DATA_DIR, filename),
-    dtype = { 'GEOID': 'object' })
+    dtype = get_read_dtypes())
 
   # load data frame with joined records
   joined_df = pd.read_csv(
     os.path.join(PUBLIC_DATA_DIR, filename),
-    dtype = { 'GEOID': 'object' })
+    dtype = get_read_dtypes())
   
   # get counts of records by state
   evict_count = evictions_df['GEOID'].apply(lambda x: x[:2]).value_counts()
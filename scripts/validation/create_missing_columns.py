@@ -7,10 +7,14 @@
 # | column name          | count of missing entries | percent of missing entries |
 ###
 
+import os
 import sys
 import csv
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_schema import get_read_dtypes
+
 def get_missing_summary(df):
 
   # get total number of rows
@@ -37,9 +41,7 @@ def get_missing_summary(df):
 if __name__ == '__main__':
   df = pd.read_csv(
     sys.stdin,
-    dtype = {
-      'GEOID': 'object'
-    }
+    dtype = get_read_dtypes()
   )
   missing = get_missing_summary(df)
   
@@ -12,6 +12,9 @@ import sys
 import csv
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_schema import get_read_dtypes
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 EVICTIONS_DATA_DIR = os.path.join(BASE_DIR, 'data', 'full-evictions')
 DEMOGRAPHICS_DATA_DIR = os.path.join(BASE_DIR, 'data', 'demographics')
@@ -24,7 +27,7 @@ if __name__ == '__main__':
   # load data frame with eviction records
   evictions_df = pd.read_csv(
     os.path.join(EVICTIONS_DATA_DIR, filename),
-    dtype = { 'GEOID': 'object' })
+    dtype = get_read_dtypes())
 
   # get list of geoids
   evictions_geoids = evictions_df.drop_duplicates('GEOID')['GEOID'].tolist()
@@ -32,7 +35,7 @@ if __name__ == '__main__':
   # load data frame with demographic records
   demographics_df = pd.read_csv(
     os.path.join(DEMOGRAPHICS_DATA_DIR, filename),
-    dtype = { 'GEOID': 'object' })
+    dtype = get_read_dtypes())
 
   # get unique geoids
   demographics_geoids = demographics_df.drop_duplicates('GEOID')['GEOID'].tolist()
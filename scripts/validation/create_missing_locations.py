@@ -7,16 +7,18 @@
 # | -------------------- | ----------------- | -------------------------- | ---------------------------- |
 # | state name           | count of all rows | count of rows missing data | percent of rows missing data |
 
+import os
 import sys
 import csv
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_schema import get_read_dtypes
+
 if __name__ == '__main__':
   df = pd.read_csv(
     sys.stdin,
-    dtype = {
-      'GEOID': 'object'
-    }
+    dtype = get_read_dtypes()
   )
 
   # column name to group by
@@ -7,6 +7,9 @@ import sys
 import csv
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_schema import get_read_dtypes
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 PUBLIC_DATA_DIR = os.path.join(BASE_DIR, 'data', 'public', 'US')
 EVICTIONS_DATA_DIR = os.path.join(BASE_DIR, 'data', 'full-evictions')
@@ -20,13 +23,13 @@ if __name__ == '__main__':
   # load data frame with eviction records
   evictions_df = pd.read_csv(
     os.path.join(EVICTIONS_DATA_DIR, filename),
-    dtype = { 'GEOID': 'object', 'year': 'object' })
+    dtype = get_read_dtypes({ 'year': 'object' }))
   evictions_df.set_index(['GEOID', 'year'],inplace=True)
 
   # load data frame with demographic records
   demographics_df = pd.read_csv(
     os.path.join(DEMOGRAPHICS_DATA_DIR, filename),
-    dtype = { 'GEOID': 'object', 'year': 'object' })
+    dtype = get_read_dtypes({ 'year': 'object' }))
   demographics_df.set_index(['GEOID', 'year'],inplace=True)
 
   # outer join evictions and demographics
@@ -62,7 +65,7 @@ if __name__ == '__main__':
   # breakdown by state
   state_fips_df = pd.read_csv(
         os.path.join(BASE_DIR, 'conf', 'state_fips.csv'),
-        dtype={'fips': 'object'})
+        dtype=get_read_dtypes())
   state_fips = {
       s[0]: s[1].upper()
       for s in zip(state_fips_df.fips, state_fips_df.usps)
@@ -0,0 +1,179 @@
+"""
+Benchmarks `clean_data_df` in `fetch_raw_census_data.py` against the
+previous row by row cleanup (`df.apply` for GEOIDs and parent locations,
+`create_tract_name` and suffix removal for each name) on generated data for
+each geography level.  Checks that both write exactly the same CSV.
+
+Arguments
+----------
+--rows : int
+    number of rows generated for block groups, other levels use a tenth of
+    this (default: 500000)
+
+Outputs
+-------
+str
+    a table of the time for each path and geography level
+
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import tempfile
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+
+import utils_census
+from utils_census import STATE_FIPS_MAP, COUNTY_FIPS_MAP, create_tract_name
+from fetch_raw_census_data import clean_data_df, REMOVE_CITY_SUFFIXES
+from data_constants import NUMERIC_COLS
+from data_schema import get_read_dtypes
+
+# Previous cleanup functions for each geography level
+ROW_CLEANUP_FUNCS = {
+    'states': {
+        'geoid': lambda x: str(x['state']).zfill(2),
+        'parent-location': lambda x: 'USA'
+    },
+    'counties': {
+        'geoid': lambda x: str(x['state']).zfill(2) + str(x['county']).zfill(3),
+        'parent-location': lambda x: STATE_FIPS_MAP[x['state']]
+    },
+    'cities': {
+        'geoid': lambda x: str(x['state']).zfill(2) + str(x['place']).zfill(5),
+        'parent-location': lambda x: STATE_FIPS_MAP[x['state']]
+    },
+    'tracts': {
+        'geoid': lambda x: (
+            str(x['state']).zfill(2) + str(x['county']).zfill(3) +
+            str(x['tract']).zfill(6)
+        ),
+        'parent-location': lambda x: COUNTY_FIPS_MAP.get(
+            str(x['state']).zfill(2) + str(x['county']).zfill(3),
+            STATE_FIPS_MAP[str(x['state']).zfill(2)]
+        )
+    },
+    'block-groups': {
+        'geoid': lambda x: (
+            str(x['state']).zfill(2) + str(x['county']).zfill(3) +
+            str(x['tract']).zfill(6) + str(x['block group'])
+        ),
+        'parent-location': lambda x: COUNTY_FIPS_MAP.get(
+            str(x['state']).zfill(2) + str(x['county']).zfill(3),
+            STATE_FIPS_MAP[str(x['state']).zfill(2)]
+        )
+    }
+}
+
+
+def remove_suffix(v):
+    for s in REMOVE_CITY_SUFFIXES:
+        try:
+            v = v[0:v.index(s)]
+        except ValueError:
+            continue
+    return v
+
+
+# Previous cleanup, without the numeric conversion which is unchanged
+def clean_data_rows(df, geo_str):
+    if geo_str == 'cities':
+        df['name'] = df['name'].apply(remove_suffix)
+        df['name'] = df['name'].str.strip()
+    elif geo_str == 'tracts':
+        df['name'] = df['tract'].apply(create_tract_name)
+    elif geo_str == 'block-groups':
+        df['name'] = df['GEOID'].apply(
+            lambda x: create_tract_name(x[5:11]) + '.' + x[11])
+    else:
+        df['name'] = df['name'].apply(lambda x: (str(x).split(',')[0]).lstrip('0'))
+    if 'GEOID' not in df.columns.values:
+        df['GEOID'] = df.apply(ROW_CLEANUP_FUNCS[geo_str]['geoid'], axis=1)
+    if 'parent-location' not in df.columns.values:
+        df['parent-location'] = df.apply(ROW_CLEANUP_FUNCS[geo_str]['parent-location'], axis=1)
+    df_numeric = [col for col in NUMERIC_COLS if col in df.columns.values]
+    df[df_numeric] = df[df_numeric].apply(pd.to_numeric)
+    return df
+
+
+# Uses the names snapshot if it exists, otherwise a generated snapshot with
+# all states and counties in `conf`
+def use_fips_snapshot():
+    if os.path.isfile(utils_census.FIPS_SNAPSHOT_FILE):
+        return
+    states = pd.read_csv(
+        os.path.join(BASE_DIR, 'conf', 'state_fips.csv'), dtype=get_read_dtypes())
+    with open(os.path.join(BASE_DIR, 'conf', 'fips_codes.txt'), 'r') as f:
+        counties = [l.strip() for l in f if l.strip()]
+    snapshot = {
+        'states': { fips: 'State ' + fips for fips in states['fips'] },
+        'counties': { fips: 'County ' + fips for fips in counties }
+    }
+    f = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+    json.dump(snapshot, f)
+    f.close()
+    utils_census.FIPS_SNAPSHOT_FILE = f.name
+
+
+# Generates a data frame like the ones fetched for the geography level
+def generate_df(geo_str, rows):
+    rng = random.Random(0)
+    counties = sorted(c for c in COUNTY_FIPS_MAP.keys() if c[:2] in STATE_FIPS_MAP)
+    data = []
+    for i in range(rows):
+        county = rng.choice(counties)
+        # some counties that are not in the snapshot
+        if rng.random() < 0.01:
+            county = county[:2] + '999'
+        tract = str(rng.randint(1, 9999) * 100 + rng.choice([0, 0, 1, 2])).zfill(6)
+        row = {
+            'state': county[:2],
+            'county': county[2:],
+            'place': str(rng.randint(1, 99999)).zfill(5),
+            'tract': tract,
+            'block group': str(rng.randint(1, 4)),
+            'population': str(rng.randint(0, 5000)),
+            'median-household-income': str(rng.randint(0, 200000)),
+        }
+        if geo_str == 'cities':
+            row['name'] = 'Place ' + str(i) + rng.choice(REMOVE_CITY_SUFFIXES + ['', ' city city'])
+        else:
+            row['name'] = '0' + str(i) + ', Somewhere'
+        data.append(row)
+    df = pd.DataFrame(data)
+    if geo_str == 'block-groups':
+        df['GEOID'] = df['state'] + df['county'] + df['tract'] + df['block group']
+    return df
+
+
+def measure(func, df, geo_str):
+    start = time.perf_counter()
+    result = func(df.copy(), geo_str)
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    use_fips_snapshot()
+
+    print('geography,rows,rows_seconds,vectorized_seconds,speedup')
+    for geo_str in ['states', 'counties', 'cities', 'tracts', 'block-groups']:
+        rows = args.rows if geo_str == 'block-groups' else max(args.rows // 10, 1)
+        df = generate_df(geo_str, rows)
+        row_time, expected = measure(clean_data_rows, df, geo_str)
+        vector_time, actual = measure(clean_data_df, df, geo_str)
+        # the CSV written by `fetch_raw_census_data.py` must be identical
+        assert (expected.to_csv(index=False, quoting=csv.QUOTE_NONNUMERIC) ==
+                actual.to_csv(index=False, quoting=csv.QUOTE_NONNUMERIC))
+        print('{},{},{:.2f},{:.2f},{:.1f}'.format(
+            geo_str, rows, row_time, vector_time, row_time / vector_time))
@@ -0,0 +1,131 @@
+"""
+Benchmarks decoding Census API responses with `decode_table` against the
+previous path of casting each row to a dict (as the census clients do),
+creating a data frame from the list of dicts, and converting numeric
+columns with `pd.to_numeric`.  Reports time and peak memory for each path
+and checks that both return the same data frame.
+
+Arguments
+----------
+--responses : str
+    directory of recorded responses, either the response cache
+    (`census/api-cache`) or JSON files in the Census API array of arrays
+    format.  Generated tract responses are used if not provided.
+--rows : int
+    number of rows in each generated response (default: 75000)
+--repeat : int
+    number of times each path is timed, the best time is reported (default: 3)
+
+Outputs
+-------
+str
+    a table of time and peak memory for each path
+
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import tracemalloc
+import pandas as pd
+from census.core import float_or_str
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+
+from utils_census import decode_table, NUMERIC_VARS
+from data_constants import ACS_VARS
+
+
+# Loads recorded responses in array of arrays format, responses from the
+# cache that are lists of dicts are skipped
+def load_responses(directory):
+    responses = []
+    for root, dirs, files in os.walk(directory):
+        for name in sorted(files):
+            filename = os.path.join(root, name)
+            if name.endswith('.json.gz'):
+                with gzip.open(filename, 'rt', encoding='utf-8') as f:
+                    data = json.load(f)['results']
+            elif name.endswith('.json'):
+                with open(filename, 'r') as f:
+                    data = json.load(f)
+            else:
+                continue
+            if data and isinstance(data[0], list):
+                responses.append(data)
+    return responses
+
+
+# Generates a response for all ACS variables for `rows` tracts
+def generate_response(rows):
+    header = list(ACS_VARS) + ['state', 'county', 'tract']
+    table = [header]
+    for i in range(rows):
+        values = [
+            'Census Tract ' + str(i) if v == 'NAME' else str((i * 37) % 5000)
+            for v in ACS_VARS
+        ]
+        table.append(values + ['01', str(i % 999).zfill(3), str(i).zfill(6)])
+    return table
+
+
+# Previous path: a dict per row with numeric variables cast by the client,
+# then numeric columns converted when the data is cleaned
+def decode_records(table):
+    headers = table[0]
+    casts = [float_or_str if h in NUMERIC_VARS else str for h in headers]
+    records = [
+        {h: (cast(v) if v is not None else None) for h, cast, v in zip(headers, casts, row)}
+        for row in table[1:]
+    ]
+    df = pd.DataFrame(records)
+    numeric = [h for h in headers if h in NUMERIC_VARS]
+    df[numeric] = df[numeric].apply(pd.to_numeric)
+    return df
+
+
+# Returns the best time and the peak memory in MB of decoding all responses
+def measure(func, responses, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for table in responses:
+            func(table)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    for table in responses:
+        func(table)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--responses')
+    parser.add_argument('--rows', type=int, default=75000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.responses:
+        responses = load_responses(args.responses)
+    else:
+        responses = [generate_response(args.rows)]
+    if not responses:
+        raise Exception('no array of arrays responses found in ' + args.responses)
+
+    for table in responses:
+        expected = decode_records(table)
+        actual = decode_table(table)
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+    rows = sum(len(t) - 1 for t in responses)
+    print('path,responses,rows,seconds,peak_mb')
+    for label, func in [('records', decode_records), ('table', decode_table)]:
+        seconds, peak = measure(func, responses, args.repeat)
+        print('{},{},{},{:.3f},{:.1f}'.format(label, len(responses), rows, seconds, peak))
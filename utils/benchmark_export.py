@@ -0,0 +1,222 @@
+"""
+Benchmarks writing and uploading the per-state CSV exports in
+`create_data_public.py` against a local stand-in of S3, comparing the
+previous scan of the national data for every state and geography with
+serial uploads against the partitioned writer with parallel uploads.  The
+uploaded objects are checked to be identical.
+
+Arguments
+----------
+--states : int
+    number of states in the generated national data (default: 50)
+--rows : int
+    number of generated rows for each state (default: 20000)
+--processes : int
+    number of processes writing state CSV files (default: cpu count)
+--latency : float
+    seconds the stand-in S3 waits before responding (default: 0.05)
+
+Outputs
+-------
+str
+    a table of wall time and uploads for each export method
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from functools import partial
+from multiprocessing import Pool
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+
+BUCKET = 'benchmark'
+
+
+class FakeS3Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency):
+        HTTPServer.__init__(self, address, FakeS3Handler)
+        self.latency = latency
+        self.objects = {}
+        self.uploads = {}
+        self.upload_count = 0
+        self.lock = threading.Lock()
+
+
+# Stores objects in memory for the S3 requests used by `upload_file`:
+# PutObject and the create, upload part, and complete multipart requests
+class FakeS3Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, body=b''):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self.read_body()
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            if 'uploadId' in params:
+                self.server.uploads[params['uploadId']][
+                    int(params['partNumber'])] = body
+            else:
+                self.server.objects[url.path] = body
+                self.server.upload_count += 1
+        self.send_response(200)
+        self.send_header('ETag', '"{}"'.format(abs(hash(body))))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query, keep_blank_values=True)
+        self.read_body()
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            if 'uploads' in params:
+                upload_id = str(len(self.server.uploads))
+                self.server.uploads[upload_id] = {}
+            else:
+                upload_id = params['uploadId'][0]
+                parts = self.server.uploads.pop(upload_id)
+                self.server.objects[url.path] = b''.join(
+                    parts[k] for k in sorted(parts))
+                self.server.upload_count += 1
+        bucket, key = url.path.lstrip('/').split('/', 1)
+        self.respond((
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<InitiateMultipartUploadResult><Bucket>{}</Bucket><Key>{}</Key>'
+            '<UploadId>{}</UploadId></InitiateMultipartUploadResult>'
+        ).format(bucket, key, upload_id).encode('utf-8'))
+
+
+# Generates national data with GEOIDs for every geography in each state
+def create_data(states, rows):
+    rng = np.random.RandomState(0)
+    lengths = np.array([2, 5, 7, 11, 12])
+    geoids = []
+    for state in range(1, states + 1):
+        fips = str(state).zfill(2)
+        digits = rng.randint(0, 10 ** 10, size=rows).astype(str)
+        geo_lengths = lengths[rng.randint(0, len(lengths), size=rows)]
+        geoids.extend(
+            (fips + d.zfill(10))[:l] for d, l in zip(digits, geo_lengths))
+    df = pd.DataFrame({ 'GEOID': geoids })
+    df['year'] = rng.randint(2000, 2017, size=len(df))
+    df['name'] = 'Fake ' + df['GEOID']
+    for col in ['population', 'evictions', 'eviction-rate']:
+        df[col] = rng.rand(len(df)) * 1000
+    return df
+
+
+# Writes and uploads state CSVs the way they were written before they
+# were partitioned, scanning the national data for each state and geography
+def export_serial(df, state_fips, client):
+    import create_data_public as export
+    for fips, state in state_fips.items():
+        os.makedirs(os.path.join(export.PUBLIC_DATA_DIR, state), exist_ok=True)
+        df.loc[df['GEOID'].str.startswith(fips)].to_csv(
+            os.path.join(export.PUBLIC_DATA_DIR, state, 'all.csv'), index=False)
+        for geo, geo_len in export.GEO_TYPE_LEN.items():
+            filename = os.path.join(
+                export.PUBLIC_DATA_DIR, state, '{}.csv'.format(geo))
+            df.loc[(df['GEOID'].str.len() == geo_len)
+                   & (df['GEOID'].str.startswith(fips))].to_csv(
+                       filename, index=False)
+            client.upload_file(filename, BUCKET, '{}/{}.csv'.format(state, geo))
+            os.remove(filename)
+
+
+def export_partitioned(df, state_fips, client, processes):
+    import create_data_public as export
+    from utils_s3 import S3Uploader
+    export.data_df = df
+    export.data_rows = export.partition_by_state(df)
+    with S3Uploader(BUCKET, client=client) as uploader, Pool(processes) as pool:
+        results = [
+            pool.apply_async(
+                export.create_state_csvs, (fips, state),
+                callback=partial(export.upload_state_csvs, uploader))
+            for fips, state in state_fips.items()
+        ]
+        pool.close()
+        for result in results:
+            result.get()
+        pool.join()
+        uploader.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--states', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = FakeS3Server(('127.0.0.1', 0), args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # point the S3 client at the stand-in before importing the export
+    os.environ['S3_ENDPOINT_URL'] = 'http://127.0.0.1:{}'.format(
+        server.server_address[1])
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    # the stand-in does not decode checksum trailers
+    os.environ['AWS_REQUEST_CHECKSUM_CALCULATION'] = 'when_required'
+    # small parts so the larger files are sent as multipart uploads
+    os.environ.setdefault('S3_MULTIPART_SIZE', '1')
+    import create_data_public as export
+    from utils_s3 import create_s3_client
+
+    tmp_dir = tempfile.mkdtemp()
+    export.PUBLIC_DATA_DIR = tmp_dir
+    try:
+        df = create_data(args.states, args.rows)
+        state_fips = {
+            str(s).zfill(2): 'S' + str(s).zfill(2)
+            for s in range(1, args.states + 1)
+        }
+        client = create_s3_client()
+
+        results = {}
+        print('method,uploads,wall_time')
+        for method, run in [
+                ('serial', lambda: export_serial(df, state_fips, client)),
+                ('partitioned', lambda: export_partitioned(
+                    df, state_fips, client, args.processes))]:
+            server.objects = {}
+            server.upload_count = 0
+            start = time.time()
+            run()
+            wall_time = time.time() - start
+            results[method] = server.objects
+            print('{},{},{:.2f}'.format(method, server.upload_count, wall_time))
+        assert results['serial'] == results['partitioned']
+    finally:
+        shutil.rmtree(tmp_dir)
+        server.shutdown()
@@ -0,0 +1,149 @@
+"""
+Benchmarks the Census API fan-out in `CensusDataStore` against a local
+stand-in of the Census API, reporting requests per second and wall time
+for each concurrency level.
+
+Arguments
+----------
+--concurrency : str
+    comma separated list of concurrency levels to benchmark (default: 1,4,8,16)
+--rate-limit : float
+    requests per second cap passed to the data store, 0 for no cap (default: 0)
+--latency : float
+    seconds the stand-in API waits before responding (default: 0.05)
+--counties : int
+    number of counties returned by the stand-in API (default: 100)
+--tracts : int
+    number of tracts per county returned by the stand-in API (default: 5)
+
+Outputs
+-------
+str
+    a table of wall time and requests per second for each concurrency level
+
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+
+
+class FakeCensusServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency, counties, tracts):
+        HTTPServer.__init__(self, address, FakeCensusHandler)
+        self.latency = latency
+        self.counties = counties
+        self.tracts = tracts
+        self.request_count = 0
+        self.count_lock = threading.Lock()
+
+
+# Responds to Census API data queries with generated rows in the same
+# array-of-arrays format as the real API
+class FakeCensusHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        # variable definitions are not needed, clients fall back to strings
+        if '/variables' in url.path:
+            self.send_response(404)
+            self.end_headers()
+            return
+        with self.server.count_lock:
+            self.server.request_count += 1
+        time.sleep(self.server.latency)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = json.dumps(self.rows(params)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Generate a response for the requested variables and geography
+    def rows(self, params):
+        fields = params['get'].split(',')
+        geo_for = params['for'].split(':')[0]
+        parents = dict(
+            p.split(':') for p in params.get('in', '').split(' ') if p)
+        header = fields + [k for k in ['state', 'county', 'tract'] if k in parents]
+        header.append(geo_for)
+
+        if geo_for == 'state':
+            children = ['01']
+        elif geo_for == 'county':
+            children = [str(i).zfill(3) for i in range(1, self.server.counties + 1)]
+        elif geo_for == 'tract':
+            children = [str(i * 100).zfill(6) for i in range(1, self.server.tracts + 1)]
+        else:
+            children = ['1', '2']
+
+        rows = [header]
+        for child in children:
+            values = [
+                ('Fake ' + child) if f == 'NAME' else str(len(child)) for f in fields
+            ]
+            geo = [
+                '01' if k == 'state' else parents[k]
+                for k in ['state', 'county', 'tract'] if k in parents
+            ]
+            rows.append(values + geo + [child])
+        return rows
+
+
+def run_benchmark(store, source, year):
+    start = time.time()
+    df = store.fetchTracts(source, ('NAME', 'B01003_001E'), year)
+    return time.time() - start, df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', default='1,4,8,16')
+    parser.add_argument('--rate-limit', type=float, default=0)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--counties', type=int, default=100)
+    parser.add_argument('--tracts', type=int, default=5)
+    args = parser.parse_args()
+
+    server = FakeCensusServer(
+        ('127.0.0.1', 0), args.latency, args.counties, args.tracts)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # point the census clients at the stand-in before importing them
+    os.environ['CENSUS_API_URL'] = 'http://127.0.0.1:{}/data/'.format(
+        server.server_address[1])
+    os.environ.setdefault('CENSUS_KEY', 'benchmark')
+    os.environ['CENSUS_CACHE_MODE'] = 'off'
+    from utils_census import CensusDataStore
+
+    baseline = None
+    print('concurrency,requests,wall_time,requests_per_second')
+    for concurrency in [int(c) for c in args.concurrency.split(',')]:
+        store = CensusDataStore(
+            concurrency=concurrency, rate_limit=args.rate_limit)
+        server.request_count = 0
+        wall_time, df = run_benchmark(store, 'acs5', 2015)
+        requests = server.request_count
+        # all concurrency levels must return the same frame
+        if baseline is None:
+            baseline = df
+        else:
+            assert baseline.reset_index(drop=True).equals(df.reset_index(drop=True))
+        print('{},{},{:.2f},{:.1f}'.format(
+            concurrency, requests, wall_time, requests / wall_time))
+
+    server.shutdown()
@@ -4,17 +4,14 @@ import csv
 import pandas as pd
 import sys
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+from data_schema import get_read_dtypes
 
 
 if __name__ == '__main__':
     # read output from `fetch_raw_census_data.py` into data frame
-    data_df = pd.read_csv(
-        sys.stdin,
-        dtype={
-            'GEOID': 'object',
-            'name': 'object',
-            'parent-location': 'object'
-        })
+    data_df = pd.read_csv(sys.stdin, dtype=get_read_dtypes())
 
     dupes = data_df[data_df.duplicated(subset=['GEOID', 'year'], keep=False)]
 
@@ -1,30 +1,48 @@
+import os
 import csv
 import sys
 import numpy as np
-import pandas as pd
 
-if __name__ == '__main__':
-    input_df = pd.read_csv(
-        sys.stdin, dtype={
-            'GEOID': 'object',
-            'n': 'object',
-            'pl': 'object'
-        })
-    col_args = sys.argv[1].split(',')
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+from utils_io import read_data, write_data, concat_data
+
+# Types of the name columns, read as strings
+INPUT_DTYPES = { 'n': 'object', 'pl': 'object' }
+
+# Output CSV quoting
+QUOTING = csv.QUOTE_NONNUMERIC
 
-    # Passing -i flag drops listed columns instead of retaining them
-    inverse = False
-    if len(sys.argv) > 2:
-        inverse = sys.argv[2] == '-i'
 
+# Keeps the columns in `col_args` in that order, adding missing columns, or
+# drops them if `inverse` is True
+def subset_cols(input_df, col_args, inverse=False):
     if not inverse:
         missing_cols = [
             c for c in col_args if c not in input_df.columns.values
         ]
         for c in missing_cols:
             input_df[c] = np.nan
-        input_df = input_df[col_args]
-    else:
-        input_df.drop(col_args, axis=1, inplace=True)
+        return input_df[col_args]
+    return input_df.drop(col_args, axis=1)
+
+
+# Stage for `run_stages.py`, with the same arguments as the script
+def transform(df_iter, args):
+    # Passing -i flag drops listed columns instead of retaining them
+    inverse = len(args) > 1 and args[1] == '-i'
+    yield subset_cols(
+        concat_data(df_iter, INPUT_DTYPES), args[0].split(','), inverse)
+
+
+if __name__ == '__main__':
+    input_df = read_data(sys.stdin, dtype=INPUT_DTYPES)
+    col_args = sys.argv[1].split(',')
+
+    # Passing -i flag drops listed columns instead of retaining them
+    inverse = False
+    if len(sys.argv) > 2:
+        inverse = sys.argv[2] == '-i'
 
-    input_df.to_csv(sys.stdout, index=False, quoting=csv.QUOTE_NONNUMERIC)
+    write_data(
+        subset_cols(input_df, col_args, inverse), sys.stdout, quoting=QUOTING)